@@ -0,0 +1,117 @@
+# Analytics module - incrementally maintained sales aggregates
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database import insert_on_conflict_update
+from app.models import Book, BookDailySales, Order, OrderItem, Payment, PaymentStatus
+
+def _upsert_sales(db: Session, rows: List[dict], increment: bool) -> None:
+    """Write (book_id, day) rows, adding to or replacing the stored totals"""
+    if not rows:
+        return
+    columns = ["units", "revenue"]
+    db.execute(insert_on_conflict_update(
+        db, BookDailySales, rows,
+        index_elements=["book_id", "day"],
+        update_columns=[] if increment else columns,
+        increment_columns=columns if increment else (),
+        updated_at=func.now()
+    ))
+
+def record_order_sales(db: Session, order_id: int, day: Optional[date] = None) -> None:
+    """Add a newly paid order to the daily sales aggregates (no commit)
+
+    Called once per order, when payment verification moves it to SUCCESS,
+    with the day the payment was recorded; only that order's items are read.
+    """
+    day = day or datetime.now(timezone.utc).date()
+    items = db.query(
+        OrderItem.book_id,
+        func.sum(OrderItem.quantity),
+        func.sum(OrderItem.quantity * OrderItem.price)
+    ).filter(OrderItem.order_id == order_id).group_by(OrderItem.book_id).all()
+    _upsert_sales(db, [
+        {"book_id": book_id, "day": day, "units": units, "revenue": revenue}
+        for book_id, units, revenue in items
+    ], increment=True)
+
+def _as_date(value) -> date:
+    # SQLite's date() returns ISO strings; PostgreSQL returns dates
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def backfill_sales(db: Session, since: Optional[date] = None, chunk_size: int = 1000) -> dict:
+    """Rebuild the aggregates from paid orders, from since (or the beginning)
+
+    Rows in the range are replaced in one transaction, so running it again
+    is safe. Orders are dated by the payment that paid them, like
+    record_order_sales does: its updated_at is set when it succeeds.
+    """
+    paid_day = func.date(func.coalesce(Payment.updated_at, Payment.created_at))
+    query = db.query(
+        OrderItem.book_id,
+        paid_day,
+        func.sum(OrderItem.quantity),
+        func.sum(OrderItem.quantity * OrderItem.price)
+    ).join(Order, Order.id == OrderItem.order_id).join(
+        Payment, Payment.reference == Order.payment_reference
+    ).filter(
+        Order.payment_status == PaymentStatus.SUCCESS
+    )
+    stale = db.query(BookDailySales)
+    if since is not None:
+        query = query.filter(paid_day >= since.isoformat())
+        stale = stale.filter(BookDailySales.day >= since)
+    stale.delete(synchronize_session=False)
+
+    report = {"rows": 0, "units": 0, "revenue": 0.0}
+    chunk: List[dict] = []
+    for book_id, day, units, revenue in query.group_by(OrderItem.book_id, paid_day).yield_per(chunk_size):
+        chunk.append({"book_id": book_id, "day": _as_date(day), "units": units, "revenue": revenue})
+        report["rows"] += 1
+        report["units"] += units
+        report["revenue"] += revenue
+        if len(chunk) >= chunk_size:
+            _upsert_sales(db, chunk, increment=False)
+            chunk = []
+    _upsert_sales(db, chunk, increment=False)
+    db.commit()
+    return report
+
+def get_bestsellers(db: Session, start: date, end: date, limit: int = 10) -> List[dict]:
+    """Top books by units sold between start and end (inclusive)"""
+    units = func.sum(BookDailySales.units).label("units")
+    top = db.query(
+        BookDailySales.book_id, units, func.sum(BookDailySales.revenue)
+    ).filter(
+        BookDailySales.day.between(start, end)
+    ).group_by(BookDailySales.book_id).order_by(units.desc(), BookDailySales.book_id).limit(limit).all()
+
+    books = {
+        book.id: book
+        for book in db.query(Book.id, Book.title, Book.author).filter(Book.id.in_([row[0] for row in top]))
+    }
+    return [
+        {
+            "book_id": book_id,
+            "title": books[book_id].title if book_id in books else "",
+            "author": books[book_id].author if book_id in books else "",
+            "units": units,
+            "revenue": revenue,
+        }
+        for book_id, units, revenue in top
+    ]
+
+def get_daily_revenue(db: Session, start: date, end: date) -> List[dict]:
+    """Units and revenue for every day between start and end, zero-filled"""
+    totals: Dict[date, Tuple[int, float]] = {
+        _as_date(day): (units, revenue)
+        for day, units, revenue in db.query(
+            BookDailySales.day, func.sum(BookDailySales.units), func.sum(BookDailySales.revenue)
+        ).filter(BookDailySales.day.between(start, end)).group_by(BookDailySales.day)
+    }
+    days: Iterable[date] = (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    return [
+        {"day": day, "units": totals.get(day, (0, 0.0))[0], "revenue": totals.get(day, (0, 0.0))[1]}
+        for day in days
+    ]
@@ -0,0 +1,54 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from app.database import get_read_db
+from app.schemas import BestSeller, DailyRevenue
+from app.analytics.aggregates import get_bestsellers, get_daily_revenue
+from app.auth.utils import get_current_admin_user, UserPrincipal
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+# Longest range one request may cover
+MAX_RANGE_DAYS = 366
+
+def resolve_range(start: Optional[date], end: Optional[date], days: int) -> Tuple[date, date]:
+    """Default to the last `days` days ending today (UTC), and validate the range"""
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=days - 1)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range cannot exceed {MAX_RANGE_DAYS} days"
+        )
+    return start, end
+
+@router.get("/bestsellers", response_model=List[BestSeller])
+def read_bestsellers(
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    days: int = Query(7, ge=1, le=MAX_RANGE_DAYS, description="Window ending at end (or today) when start is omitted"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
+):
+    """Best-selling books by units over a date range (admin only)"""
+    start, end = resolve_range(start, end, days)
+    return get_bestsellers(db, start, end, limit)
+
+@router.get("/revenue", response_model=List[DailyRevenue])
+def read_daily_revenue(
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    days: int = Query(30, ge=1, le=MAX_RANGE_DAYS, description="Window ending at end (or today) when start is omitted"),
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
+):
+    """Units and revenue per day over a date range (admin only)"""
+    start, end = resolve_range(start, end, days)
+    return get_daily_revenue(db, start, end)
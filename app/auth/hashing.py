@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import bcrypt
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+
+# bcrypt primitives. Kept free of database imports so pool workers start cheaply.
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash"""
+    # Use bcrypt directly to avoid passlib issues
+    password_bytes = plain_password.encode('utf-8')
+    hashed_bytes = hashed_password.encode('utf-8')
+    return bcrypt.checkpw(password_bytes, hashed_bytes)
+
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """Hash a password"""
+    # Use bcrypt directly to avoid passlib issues
+    password_bytes = password.encode('utf-8')
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(password_bytes, salt)
+    return hashed.decode('utf-8')
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was made with a different cost than configured"""
+    # Modular crypt format: $2b$<rounds>$<salt+hash>
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.BCRYPT_ROUNDS
+
+# Bounded hashing pool. bcrypt is pure CPU, so it runs in worker processes;
+# a semaphore caps queued work and sheds load with 429 once it is full.
+# Workers are spawned, not forked: forking a server with live threads, locks
+# and pooled connections can deadlock or share sockets with the children.
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(settings.PASSWORD_HASH_MAX_PENDING, 1))
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Create the hashing pool on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+async def _run(func, *args):
+    """Run a bcrypt call in the hashing pool, or reject it if the pool is saturated"""
+    if not _slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        # Awaited, so no event loop or threadpool thread waits on the hash
+        if settings.PASSWORD_HASH_WORKERS <= 0:
+            return await run_in_threadpool(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+    finally:
+        _slots.release()
+
+async def verify_password_in_pool(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool"""
+    return await _run(verify_password, plain_password, hashed_password)
+
+async def hash_password_in_pool(password: str) -> str:
+    """Hash a password at the configured cost on the hashing pool"""
+    return await _run(get_password_hash, password, settings.BCRYPT_ROUNDS)
+
+def shutdown_hashing_pool() -> None:
+    """Stop the hashing pool workers"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
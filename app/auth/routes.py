@@ -1,25 +1,29 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User, UserRole
 from app.schemas import UserCreate, User as UserSchema, Token
 from app.auth.utils import (
-    verify_password, get_password_hash, create_access_token,
-    get_current_active_user
+    create_access_token, get_current_active_user, user_claims, UserPrincipal
 )
+from app.auth.hashing import verify_password_in_pool, hash_password_in_pool, needs_rehash
 from app.config import settings
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/signup", response_model=UserSchema)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
+    # Async so the hash is awaited; blocking database calls go to the threadpool
     # Check if user already exists
-    db_user = db.query(User).filter(
-        (User.email == user.email) | (User.username == user.username)
-    ).first()
+    db_user = await run_in_threadpool(
+        db.query(User).filter(
+            (User.email == user.email) | (User.username == user.username)
+        ).first
+    )
     
     if db_user:
         raise HTTPException(
@@ -31,7 +35,7 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     role = UserRole.ADMIN if user.admin_code == "ADMIN2024SECRET" else UserRole.USER
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password_in_pool(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -41,18 +45,18 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await run_in_threadpool(db.commit)
+    await run_in_threadpool(db.refresh, db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login and get access token"""
     # Authenticate user
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await run_in_threadpool(db.query(User).filter(User.email == form_data.username).first)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_in_pool(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -65,21 +69,29 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             detail="Inactive user"
         )
     
+    # Read before the commit below expires the instance (a reload would block the loop)
+    claims = user_claims(user)
+    
+    # Upgrade hashes made at a different cost while we have the plain password
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password_in_pool(form_data.password)
+        await run_in_threadpool(db.commit)
+    
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=claims, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserSchema)
-def read_users_me(current_user: User = Depends(get_current_active_user)):
+def read_users_me(current_user: UserPrincipal = Depends(get_current_active_user)):
     """Get current user information"""
     return current_user
 
 @router.get("/admin-only")
-def admin_only_route(current_user: User = Depends(get_current_active_user)):
+def admin_only_route(current_user: UserPrincipal = Depends(get_current_active_user)):
     """Test route for admin users only"""
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
@@ -1,42 +1,59 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
+from app.cache import TTLCache
 from app.config import settings
 from app.database import get_db
-from app.models import User
+from app.models import User, UserRole
 from app.schemas import TokenData
-
-# Password hashing
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__default_rounds=12,
-    bcrypt__min_rounds=10,
-    bcrypt__max_rounds=15
-)
+from app.auth.hashing import verify_password, get_password_hash
 
 # JWT token scheme
 security = HTTPBearer()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    # Use bcrypt directly to avoid passlib issues
-    password_bytes = plain_password.encode('utf-8')
-    hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Session-independent snapshot of the authenticated user"""
+    id: int
+    email: str
+    username: str
+    role: UserRole
+    is_active: bool
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            role=user.role,
+            is_active=user.is_active,
+            created_at=user.created_at,
+        )
+
+# Principals by token subject (email)
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+def invalidate_user(email: str) -> None:
+    """Drop a cached principal, e.g. after deactivating a user or changing their role"""
+    user_cache.delete(email)
 
-def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    # Use bcrypt directly to avoid passlib issues
-    password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    return hashed.decode('utf-8')
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_updated_user(mapper, connection, target) -> None:
+    """Keep the principal cache in step with ORM writes to users"""
+    invalidate_user(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted:
+        invalidate_user(old_email)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
@@ -50,6 +67,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def user_claims(user: User) -> dict:
+    """Claims identifying a user in an access token"""
+    claims = {"sub": user.email}
+    if settings.JWT_EMBED_USER_CLAIMS:
+        # Lets get_current_user skip the database; role changes and
+        # deactivation then take effect when the token expires
+        claims.update({
+            "uid": user.id,
+            "username": user.username,
+            "role": user.role.value,
+            "created_at": user.created_at.isoformat(),
+        })
+    return claims
+
 def verify_token(token: str, credentials_exception):
     """Verify and decode a JWT token"""
     try:
@@ -57,15 +88,21 @@ def verify_token(token: str, credentials_exception):
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+        token_data = TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            username=payload.get("username"),
+            role=payload.get("role"),
+            created_at=payload.get("created_at")
+        )
+    except (JWTError, ValueError):
         raise credentials_exception
     return token_data
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> User:
+) -> UserPrincipal:
     """Get the current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -76,18 +113,35 @@ def get_current_user(
     token = credentials.credentials
     token_data = verify_token(token, credentials_exception)
     
+    # Fully described by the token itself
+    if settings.JWT_EMBED_USER_CLAIMS and token_data.user_id is not None:
+        return UserPrincipal(
+            id=token_data.user_id,
+            email=token_data.email,
+            username=token_data.username,
+            role=token_data.role,
+            is_active=True,
+            created_at=token_data.created_at,
+        )
+    
+    principal = user_cache.get(token_data.email)
+    if principal is not None:
+        return principal
+    
     user = db.query(User).filter(User.email == token_data.email).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = UserPrincipal.from_user(user)
+    user_cache.set(token_data.email, principal)
+    return principal
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
     """Get the current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+def get_current_admin_user(current_user: UserPrincipal = Depends(get_current_active_user)) -> UserPrincipal:
     """Get the current admin user"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -0,0 +1,111 @@
+# Books module - AsyncSession counterparts of the read functions in crud.py
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.cache import get_shared_client
+from app.database import async_primary_session, get_async_engine
+from app.models import Book
+from app.books.search import get_search_backend
+from app.books.cache import (
+    CATALOGUE_VERSION_QUERY, book_cache, cache_book, cache_catalogue_version,
+    catalogue_version, get_cached_book, get_cached_book_id
+)
+from app.books.crud import BOOK_COLUMNS
+
+async def _cache_call(function, *args):
+    # The shared cache tier is a blocking Redis client; keep it off the event loop
+    if get_shared_client() is None:
+        return function(*args)
+    return await run_in_threadpool(function, *args)
+
+async def get_book(db: AsyncSession, book_id: int) -> Optional[Book]:
+    """Get a book by ID"""
+    return await db.scalar(select(Book).where(Book.id == book_id))
+
+async def get_book_by_isbn(db: AsyncSession, isbn: str) -> Optional[Book]:
+    """Get a book by ISBN"""
+    return await db.scalar(select(Book).where(Book.isbn == isbn))
+
+async def get_book_entry(db: AsyncSession, book_id: int) -> Optional[dict]:
+    """Get a serialized book and its ETag by ID, from the cache when possible"""
+    entry = await _cache_call(get_cached_book, book_id)
+    if entry is None:
+        async with async_primary_session(db) as primary:
+            book = await get_book(primary, book_id)
+            if book is None:
+                return None
+            entry = await _cache_call(cache_book, book)
+    return entry
+
+async def get_book_entry_by_isbn(db: AsyncSession, isbn: str) -> Optional[dict]:
+    """Get a serialized book and its ETag by ISBN, from the cache when possible"""
+    book_id = await _cache_call(get_cached_book_id, isbn)
+    entry = await _cache_call(get_cached_book, book_id) if book_id is not None else None
+    if entry is None or entry["data"]["isbn"] != isbn:
+        async with async_primary_session(db) as primary:
+            book = await get_book_by_isbn(primary, isbn)
+            if book is None:
+                return None
+            entry = await _cache_call(cache_book, book)
+    return entry
+
+async def get_catalogue_version(db: AsyncSession) -> dict:
+    """Async counterpart of app.books.cache.get_catalogue_version"""
+    version = await _cache_call(book_cache.get, "catalogue")
+    if version is None:
+        async with async_primary_session(db) as primary:
+            row = (await primary.execute(CATALOGUE_VERSION_QUERY)).one()
+        version = await _cache_call(cache_catalogue_version, row)
+    return version
+
+async def get_listing_version(db: AsyncSession) -> dict:
+    """Async counterpart of app.books.cache.get_listing_version"""
+    if db.bind is get_async_engine():
+        return await get_catalogue_version(db)
+    return catalogue_version((await db.execute(CATALOGUE_VERSION_QUERY)).one())
+
+async def get_book_rows(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    active_only: bool = True
+) -> List[dict]:
+    """Async counterpart of app.books.crud.get_book_rows"""
+    query = select(*BOOK_COLUMNS)
+    
+    if active_only:
+        query = query.where(Book.is_active == True)
+    
+    if search:
+        query = get_search_backend(db.bind.dialect.name).apply(query, search)
+    
+    result = await db.execute(query.offset(skip).limit(limit))
+    return [row._asdict() for row in result]
+
+async def get_book_rows_page(
+    db: AsyncSession,
+    after_id: Optional[int] = None,
+    limit: int = 100,
+    search: Optional[str] = None,
+    active_only: bool = True
+) -> Tuple[List[dict], Optional[int]]:
+    """Async counterpart of app.books.crud.get_book_rows_page"""
+    query = select(*BOOK_COLUMNS)
+    
+    if active_only:
+        query = query.where(Book.is_active == True)
+    
+    if search:
+        # Keyset pages follow ID order, so relevance ranking is skipped
+        query = get_search_backend(db.bind.dialect.name).apply(query, search, ranked=False)
+    
+    if after_id is not None:
+        query = query.where(Book.id > after_id)
+    
+    # Fetch one extra row to know whether another page exists
+    rows = [row._asdict() for row in await db.execute(query.order_by(Book.id).limit(limit + 1))]
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["id"]
+    return rows, None
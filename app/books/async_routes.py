@@ -0,0 +1,69 @@
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_read_db
+from app.schemas import Book, BookPage
+from app.pagination import encode_cursor, decode_cursor
+from app.books import async_crud
+from app.books.routes import book_entry_response
+from app.responses import ORJSONResponse
+from app.http_cache import make_etag, parse_timestamp, cache_headers, is_not_modified, not_modified
+
+# Read-only book endpoints on the async database layer, with the same cache,
+# ETag and replica routing as their sync counterparts. Mounted ahead of the
+# sync router when ASYNC_DATABASE is enabled; book IDs use the int converter,
+# so fixed paths such as /books/popular, /books/stream and /books/export fall
+# through to the sync router, as do the write endpoints.
+router = APIRouter(prefix="/books", tags=["books"])
+
+@router.get("/", response_model=Union[List[Book], BookPage])
+async def read_books(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(
+        None, description="Keyset cursor; pass an empty value for the first page"
+    ),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get list of books with optional search and pagination"""
+    # On a replica, its own version, so the ETag always matches the rows
+    version = await async_crud.get_listing_version(db)
+    etag = make_etag([version["etag"], str(request.query_params)])
+    headers = cache_headers(etag, parse_timestamp(version["last_modified"]))
+    if is_not_modified(request, etag, parse_timestamp(version["last_modified"])):
+        return not_modified(headers)
+    
+    if cursor is not None:
+        after_id = decode_cursor(cursor).get("id")
+        rows, last_id = await async_crud.get_book_rows_page(
+            db, after_id=after_id, limit=limit, search=search
+        )
+        next_cursor = encode_cursor({"id": last_id}) if last_id is not None else None
+        return ORJSONResponse({"items": rows, "next_cursor": next_cursor}, headers=headers)
+    
+    rows = await async_crud.get_book_rows(db, skip=skip, limit=limit, search=search)
+    return ORJSONResponse(rows, headers=headers)
+
+@router.get("/{book_id:int}", response_model=Book)
+async def read_book(book_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """Get a specific book by ID"""
+    entry = await async_crud.get_book_entry(db, book_id=book_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    return book_entry_response(request, entry)
+
+@router.get("/isbn/{isbn}", response_model=Book)
+async def read_book_by_isbn(isbn: str, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """Get a book by ISBN"""
+    entry = await async_crud.get_book_entry_by_isbn(db, isbn=isbn)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    return book_entry_response(request, entry)
@@ -0,0 +1,169 @@
+# Books module - bulk import and export
+import codecs
+import csv
+import json
+from typing import IO, Dict, Iterable, Iterator, List, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy import func, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.database import insert_on_conflict_update, rows_per_statement
+from app.models import Book
+from app.schemas import BookCreate
+from app.books.search import search_backend_for
+from app.books.cache import invalidate_books
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# Columns an import may overwrite on an existing ISBN
+UPSERT_COLUMNS = [field for field in BookCreate.model_fields if field != "isbn"]
+# Keep error reports bounded for feeds that are wrong from top to bottom
+MAX_REPORTED_ERRORS = 1000
+# DictReader key for cells beyond the header's columns
+EXTRA_COLUMNS = "__extra__"
+
+def _decode_lines(stream: IO[bytes], bad_lines: Set[int]) -> Iterator[str]:
+    """Decode a byte stream line by line, noting lines that are not valid UTF-8"""
+    for line_number, line in enumerate(stream, start=1):
+        if line_number == 1 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError:
+            bad_lines.add(line_number)
+            yield line.decode("utf-8", errors="replace")
+
+def iter_import_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row number, raw row) from a CSV or NDJSON byte stream
+
+    Raw rows are dicts, or a ValueError describing a row that could not be
+    parsed (invalid UTF-8, malformed JSON or CSV, extra CSV columns).
+    """
+    bad_lines: Set[int] = set()
+    lines = _decode_lines(stream, bad_lines)
+    if fmt == "csv":
+        reader = csv.DictReader(lines, restkey=EXTRA_COLUMNS)
+        row_number = 0
+        last_line = 1  # The header
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as e:
+                row_number += 1
+                last_line = reader.line_num
+                yield row_number, ValueError(f"Invalid CSV: {e}")
+                continue
+            row_number += 1
+            # A quoted field may span lines
+            first_line, last_line = last_line + 1, reader.line_num
+            if any(line in bad_lines for line in range(first_line, last_line + 1)):
+                yield row_number, ValueError("Invalid UTF-8")
+            elif EXTRA_COLUMNS in row:
+                yield row_number, ValueError(
+                    f"Expected {len(reader.fieldnames)} columns, got "
+                    f"{len(reader.fieldnames) + len(row[EXTRA_COLUMNS])}"
+                )
+            else:
+                # Empty (or missing trailing) CSV cells mean "not provided"
+                yield row_number, {key: value for key, value in row.items() if value not in ("", None)}
+    else:
+        for row_number, line in enumerate(lines, start=1):
+            if row_number in bad_lines:
+                yield row_number, ValueError("Invalid UTF-8")
+                continue
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except ValueError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e}")
+
+def _upsert_chunk(db: Session, books: List[dict]) -> List[int]:
+    """Write one validated chunk in one transaction and return the affected book IDs"""
+    # One statement cannot touch the same row twice; the last row for an ISBN wins
+    by_isbn: Dict[str, dict] = {}
+    without_isbn = []
+    for book in books:
+        if book.get("isbn"):
+            by_isbn[book["isbn"]] = book
+        else:
+            without_isbn.append(book)
+
+    # Large chunks take several statements to stay within the driver's
+    # bound-parameter limit; each batch is indexed as it is written
+    batch_size = rows_per_statement(db, Book)
+    upserts = list(by_isbn.values())
+    statements = [
+        insert_on_conflict_update(
+            db, Book, upserts[start:start + batch_size],
+            index_elements=["isbn"],
+            update_columns=UPSERT_COLUMNS,
+            updated_at=func.now()
+        )
+        for start in range(0, len(upserts), batch_size)
+    ]
+    statements.extend(
+        insert(Book).values(without_isbn[start:start + batch_size])
+        for start in range(0, len(without_isbn), batch_size)
+    )
+
+    search_backend = search_backend_for(db)
+    book_ids = []
+    for statement in statements:
+        batch_ids = db.scalars(statement.returning(Book.id)).all()
+        search_backend.index_books(db, batch_ids)
+        book_ids.extend(batch_ids)
+
+    invalidate_books(db, book_ids)
+    db.commit()
+    return book_ids
+
+def import_books(db: Session, rows: Iterable[Tuple[int, object]], chunk_size: int = 1000) -> dict:
+    """Validate and upsert books by ISBN in chunks, committing once per chunk"""
+    report = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+
+    def record_error(row_number: int, error: str) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": error})
+
+    chunk: List[dict] = []
+    chunk_rows: List[int] = []
+
+    def flush_chunk() -> None:
+        try:
+            report["imported"] += len(_upsert_chunk(db, chunk))
+        except SQLAlchemyError as e:
+            # The database rejected the whole batch; report it against its rows
+            db.rollback()
+            message = f"Batch rejected by the database: {e.__class__.__name__}: {getattr(e, 'orig', e)}"
+            for row_number in chunk_rows:
+                record_error(row_number, message)
+        chunk.clear()
+        chunk_rows.clear()
+
+    for row_number, raw in rows:
+        report["processed"] += 1
+        if isinstance(raw, Exception):
+            record_error(row_number, str(raw))
+            continue
+        if not isinstance(raw, dict):
+            record_error(row_number, "Expected an object")
+            continue
+        try:
+            chunk.append(BookCreate(**raw).model_dump())
+        except ValidationError as e:
+            record_error(row_number, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            ))
+            continue
+        chunk_rows.append(row_number)
+
+        if len(chunk) >= chunk_size:
+            flush_chunk()
+
+    if chunk:
+        flush_chunk()
+    return report
@@ -0,0 +1,105 @@
+# Books module - read-through cache for single-book lookups
+from typing import Iterable, Optional
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app.cache import TieredCache
+from app.config import settings
+from app.database import get_engine, primary_session
+from app.http_cache import make_etag
+from app.models import Book
+from app.schemas import Book as BookSchema
+
+# "id:<id>" -> {"data": serialized book, "etag": ...}
+# "isbn:<isbn>" -> book id
+# "catalogue" -> {"etag": ..., "last_modified": ...} for the whole books table
+book_cache = TieredCache(
+    namespace="book",
+    maxsize=settings.BOOK_CACHE_MAX_SIZE,
+    local_ttl=settings.BOOK_CACHE_LOCAL_TTL_SECONDS,
+    shared_ttl=settings.BOOK_CACHE_SHARED_TTL_SECONDS
+)
+
+def cache_book(book: Book) -> dict:
+    """Serialize a book and store it, with its ETag, under its ID and ISBN keys"""
+    data = BookSchema.model_validate(book).model_dump(mode="json")
+    entry = {"data": data, "etag": make_etag(data)}
+    book_cache.set(f"id:{book.id}", entry)
+    if book.isbn:
+        book_cache.set(f"isbn:{book.isbn}", book.id)
+    return entry
+
+def get_cached_book(book_id: int) -> Optional[dict]:
+    return book_cache.get(f"id:{book_id}")
+
+def get_cached_book_id(isbn: str) -> Optional[int]:
+    return book_cache.get(f"isbn:{isbn}")
+
+def get_catalogue_version(db: Session) -> dict:
+    """Version of the whole catalogue, for validating list responses
+
+    Recomputed with one aggregate query after any book write; the stock sum
+    catches stock-only changes that land within the timestamp resolution.
+    """
+    version = book_cache.get("catalogue")
+    if version is None:
+        # From the primary: a replica's older version would be cached as
+        # current and keep stale list responses and pages valid
+        with primary_session(db) as primary:
+            version = cache_catalogue_version(primary.execute(CATALOGUE_VERSION_QUERY).one())
+    return version
+
+# Aggregates that change with any book write
+CATALOGUE_VERSION_QUERY = select(
+    func.count(Book.id),
+    func.max(Book.id),
+    func.max(Book.created_at),
+    func.max(Book.updated_at),
+    func.sum(Book.stock_quantity)
+)
+
+def catalogue_version(row) -> dict:
+    """Build the catalogue version from a CATALOGUE_VERSION_QUERY row"""
+    count, max_id, max_created, max_updated, total_stock = row
+    last_modified = max(filter(None, [max_created, max_updated]), default=None)
+    return {
+        "etag": make_etag([count, max_id, max_created, max_updated, total_stock]),
+        "last_modified": last_modified.isoformat() if last_modified else None,
+    }
+
+def cache_catalogue_version(row) -> dict:
+    """Build the catalogue version from a CATALOGUE_VERSION_QUERY row and store it"""
+    version = catalogue_version(row)
+    book_cache.set("catalogue", version)
+    return version
+
+def get_listing_version(db: Session) -> dict:
+    """Catalogue version of the database db reads from, for validating rows read through db
+
+    The cached version is the primary's. A lagging replica's rows must not
+    be served under it, or clients and proxies would keep them until the
+    next write, so replica sessions compute their own, uncached.
+    """
+    if db.get_bind() is get_engine():
+        return get_catalogue_version(db)
+    return catalogue_version(db.execute(CATALOGUE_VERSION_QUERY).one())
+
+def invalidate_books(db: Session, book_ids: Iterable[int] = (), isbns: Iterable[str] = ()) -> None:
+    """Drop cache entries once the session's current transaction commits
+
+    Evicting before the commit would let a concurrent reader re-cache the
+    old row; on rollback the pending evictions are discarded.
+    """
+    pending = db.info.setdefault("invalidate_book_keys", set())
+    pending.add("catalogue")
+    pending.update(f"id:{book_id}" for book_id in book_ids)
+    pending.update(f"isbn:{isbn}" for isbn in isbns if isbn)
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed_books(session: Session) -> None:
+    keys = session.info.pop("invalidate_book_keys", None)
+    if keys:
+        book_cache.delete(*keys)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_evictions(session: Session) -> None:
+    session.info.pop("invalidate_book_keys", None)
@@ -1,13 +1,50 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, case, func, update
+from app.database import primary_session
 from app.models import Book
 from app.schemas import BookCreate, BookUpdate
+from app.books.search import search_backend_for
+from app.books.cache import cache_book, get_cached_book, get_cached_book_id, invalidate_books
 
 def get_book(db: Session, book_id: int) -> Optional[Book]:
     """Get a book by ID"""
     return db.query(Book).filter(Book.id == book_id).first()
 
+def get_book_entry(db: Session, book_id: int) -> Optional[dict]:
+    """Get a serialized book and its ETag by ID, from the cache when possible"""
+    entry = get_cached_book(book_id)
+    if entry is None:
+        # Cache misses are filled from the primary, never from a replica
+        with primary_session(db) as primary:
+            book = get_book(primary, book_id)
+            if book is None:
+                return None
+            entry = cache_book(book)
+    return entry
+
+def get_book_entries(db: Session, book_ids: List[int]) -> List[dict]:
+    """Get serialized books in the given order, fetching cache misses in one query"""
+    entries = {book_id: get_cached_book(book_id) for book_id in book_ids}
+    missing = [book_id for book_id, entry in entries.items() if entry is None]
+    if missing:
+        with primary_session(db) as primary:
+            for book in primary.query(Book).filter(Book.id.in_(missing)):
+                entries[book.id] = cache_book(book)
+    return [entries[book_id] for book_id in book_ids if entries[book_id] is not None]
+
+def get_book_entry_by_isbn(db: Session, isbn: str) -> Optional[dict]:
+    """Get a serialized book and its ETag by ISBN, from the cache when possible"""
+    book_id = get_cached_book_id(isbn)
+    entry = get_cached_book(book_id) if book_id is not None else None
+    if entry is None or entry["data"]["isbn"] != isbn:
+        with primary_session(db) as primary:
+            book = get_book_by_isbn(primary, isbn)
+            if book is None:
+                return None
+            entry = cache_book(book)
+    return entry
+
 def get_books(
     db: Session, 
     skip: int = 0, 
@@ -22,18 +59,94 @@ def get_books(
         query = query.filter(Book.is_active == True)
     
     if search:
-        query = query.filter(
-            Book.title.ilike(f"%{search}%") | 
-            Book.author.ilike(f"%{search}%") |
-            Book.description.ilike(f"%{search}%")
-        )
+        # Full-text match ordered by relevance
+        query = search_backend_for(db).apply(query, search)
     
     return query.offset(skip).limit(limit).all()
 
+def get_books_page(
+    db: Session,
+    after_id: Optional[int] = None,
+    limit: int = 100,
+    search: Optional[str] = None,
+    active_only: bool = True
+) -> Tuple[List[Book], Optional[int]]:
+    """Get a keyset page of books ordered by ID, plus the last ID if more remain"""
+    query = db.query(Book)
+    
+    if active_only:
+        query = query.filter(Book.is_active == True)
+    
+    if search:
+        # Keyset pages follow ID order, so relevance ranking is skipped
+        query = search_backend_for(db).apply(query, search, ranked=False)
+    
+    if after_id is not None:
+        query = query.filter(Book.id > after_id)
+    
+    # Fetch one extra row to know whether another page exists
+    books = query.order_by(Book.id).limit(limit + 1).all()
+    if len(books) > limit:
+        return books[:limit], books[limit - 1].id
+    return books, None
+
+# Read-only fast path: plain column tuples, no ORM identity map or
+# per-row Pydantic validation. Columns match the Book response schema.
+BOOK_COLUMNS = [
+    Book.id, Book.title, Book.author, Book.description, Book.price,
+    Book.stock_quantity, Book.isbn, Book.image_url, Book.is_active,
+    Book.created_at, Book.updated_at,
+]
+
+def get_book_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    active_only: bool = True
+) -> List[dict]:
+    """Like get_books, but as plain dicts ready for JSON encoding"""
+    query = db.query(*BOOK_COLUMNS)
+    
+    if active_only:
+        query = query.filter(Book.is_active == True)
+    
+    if search:
+        query = search_backend_for(db).apply(query, search)
+    
+    return [row._asdict() for row in query.offset(skip).limit(limit)]
+
+def get_book_rows_page(
+    db: Session,
+    after_id: Optional[int] = None,
+    limit: int = 100,
+    search: Optional[str] = None,
+    active_only: bool = True
+) -> Tuple[List[dict], Optional[int]]:
+    """Like get_books_page, but as plain dicts ready for JSON encoding"""
+    query = db.query(*BOOK_COLUMNS)
+    
+    if active_only:
+        query = query.filter(Book.is_active == True)
+    
+    if search:
+        query = search_backend_for(db).apply(query, search, ranked=False)
+    
+    if after_id is not None:
+        query = query.filter(Book.id > after_id)
+    
+    rows = [row._asdict() for row in query.order_by(Book.id).limit(limit + 1)]
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["id"]
+    return rows, None
+
 def create_book(db: Session, book: BookCreate) -> Book:
     """Create a new book"""
     db_book = Book(**book.dict())
     db.add(db_book)
+    db.flush()  # Get the book ID for the search index
+    search_backend_for(db).index_book(db, db_book)
+    invalidate_books(db, [db_book.id], [db_book.isbn])
     db.commit()
     db.refresh(db_book)
     return db_book
@@ -45,9 +158,13 @@ def update_book(db: Session, book_id: int, book: BookUpdate) -> Optional[Book]:
         return None
     
     update_data = book.dict(exclude_unset=True)
+    invalidate_books(db, [book_id], [db_book.isbn, update_data.get("isbn")])
     for field, value in update_data.items():
         setattr(db_book, field, value)
     
+    if update_data.keys() & {"title", "author", "description"}:
+        search_backend_for(db).index_book(db, db_book)
+    
     db.commit()
     db.refresh(db_book)
     return db_book
@@ -59,6 +176,7 @@ def delete_book(db: Session, book_id: int) -> bool:
         return False
     
     db_book.is_active = False
+    invalidate_books(db, [book_id])
     db.commit()
     return True
 
@@ -73,15 +191,51 @@ def check_book_stock(db: Session, book_id: int, quantity: int) -> bool:
         return False
     return book.stock_quantity >= quantity
 
+def adjust_books_stock(db: Session, changes: Dict[int, int]) -> int:
+    """Add to (or take from) stock for several books in one UPDATE, clamped at 0 (no commit)
+
+    Returns the number of books updated.
+    """
+    if not changes:
+        return 0
+    adjusted = func.coalesce(Book.stock_quantity, 0) + case(changes, value=Book.id)
+    result = db.execute(
+        update(Book)
+        .where(Book.id.in_(changes.keys()))
+        .values(stock_quantity=case((adjusted < 0, 0), else_=adjusted))
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_books(db, changes.keys())
+    return result.rowcount
+
 def update_book_stock(db: Session, book_id: int, quantity_change: int) -> bool:
     """Update book stock quantity"""
-    book = get_book(db, book_id)
-    if not book:
-        return False
-    
-    book.stock_quantity += quantity_change
-    if book.stock_quantity < 0:
-        book.stock_quantity = 0
-    
+    # Computed in the database, so concurrent changes cannot overwrite each other
+    updated = adjust_books_stock(db, {book_id: quantity_change})
     db.commit()
+    return updated == 1
+
+def get_books_for_update(db: Session, book_ids: Iterable[int]) -> Dict[int, Book]:
+    """Fetch several books in one query, row-locked in ID order to avoid deadlocks"""
+    books = db.query(Book).filter(
+        Book.id.in_(sorted(set(book_ids)))
+    ).order_by(Book.id).with_for_update().all()
+    return {book.id: book for book in books}
+
+def take_books_stock(db: Session, quantities: Dict[int, int]) -> bool:
+    """Decrement stock for several books with one conditional UPDATE (no commit)
+
+    Returns False, leaving stock untouched, if any book lacks enough stock.
+    """
+    wanted = case(quantities, value=Book.id)
+    result = db.execute(
+        update(Book)
+        .where(Book.id.in_(quantities.keys()), Book.stock_quantity >= wanted)
+        .values(stock_quantity=Book.stock_quantity - wanted)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(quantities):
+        db.rollback()
+        return False
+    invalidate_books(db, quantities.keys())
     return True
@@ -0,0 +1,152 @@
+# Books module - "customers also bought" and popularity index
+#
+# Built periodically from paid orders instead of self-joining order_items
+# per request: order lines are loaded once into NumPy arrays, book pairs
+# are generated per order-size group with vectorized indexing, counted
+# with np.unique, and the top-k partners per book are kept in CSR form
+# (indptr/indices), so a lookup is two array reads. NumPy is imported by
+# the build itself, keeping it out of the app's import time.
+import asyncio
+import time
+from typing import TYPE_CHECKING, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal, replica_router
+from app.books.crud import get_book_entries
+from app.models import Order, OrderItem, PaymentStatus
+
+if TYPE_CHECKING:
+    import numpy as np
+
+class RecommendationIndex:
+    """Immutable snapshot of co-purchase top-k lists and book popularity"""
+
+    def __init__(self, indptr: "np.ndarray", related: "np.ndarray", popular: "np.ndarray", built_at: float):
+        self.indptr = indptr    # related[indptr[b]:indptr[b + 1]] are book b's partners, best first
+        self.related = related
+        self.popular = popular  # Book IDs by number of paid orders, most first
+        self.built_at = built_at
+
+    def related_to(self, book_id: int, limit: int) -> List[int]:
+        if book_id < 0 or book_id + 1 >= len(self.indptr):
+            return []
+        start = self.indptr[book_id]
+        return self.related[start:min(start + limit, self.indptr[book_id + 1])].tolist()
+
+    def most_popular(self, limit: int) -> List[int]:
+        return self.popular[:limit].tolist()
+
+_index: Optional[RecommendationIndex] = None
+
+def get_recommendation_index() -> Optional[RecommendationIndex]:
+    """The latest built index (None until the first build finishes)"""
+    return _index
+
+def related_book_ids(book_id: int, limit: int) -> List[int]:
+    """IDs of the books most often bought with book_id, best first"""
+    return _index.related_to(book_id, limit) if _index is not None else []
+
+def popular_book_ids(limit: int) -> List[int]:
+    """IDs of the books in the most paid orders, most first"""
+    return _index.most_popular(limit) if _index is not None else []
+
+def recommended_books(db: Session, book_ids: List[int], limit: int, exclude: Optional[int] = None) -> List[dict]:
+    """Serialized active books among book_ids, in order, up to limit"""
+    book_ids = list(dict.fromkeys(book_id for book_id in book_ids if book_id != exclude))
+    return [
+        entry["data"] for entry in get_book_entries(db, book_ids)
+        if entry["data"]["is_active"]
+    ][:limit]
+
+def load_order_lines(db: Session, batch_size: int = 50000):
+    """Distinct (order_id, book_id) pairs of paid orders, as two int64 arrays sorted by order"""
+    import numpy as np
+    result = db.execute(
+        select(OrderItem.order_id, OrderItem.book_id).join(
+            Order, Order.id == OrderItem.order_id
+        ).where(
+            Order.payment_status == PaymentStatus.SUCCESS
+        ).order_by(OrderItem.order_id).execution_options(yield_per=batch_size)
+    )
+    # One small array per batch rather than a Python tuple per order line
+    chunks = [np.array(partition, dtype=np.int64).reshape(-1, 2) for partition in result.partitions()]
+    pairs = np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.int64)
+    if len(pairs) == 0:
+        return pairs[:, 0], pairs[:, 1]
+    # A book listed twice in one order counts once
+    pairs = np.unique(pairs, axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+def build_index(order_ids: "np.ndarray", book_ids: "np.ndarray", top_k: int, max_order_size: int) -> RecommendationIndex:
+    """Build the index from order lines sorted by order_id"""
+    import numpy as np
+    empty = np.zeros(0, dtype=np.int64)
+    if len(book_ids) == 0:
+        return RecommendationIndex(np.zeros(1, dtype=np.int64), empty, empty, time.time())
+    num_books = int(book_ids.max()) + 1
+
+    # Popularity: number of paid orders containing each book
+    order_counts = np.bincount(book_ids, minlength=num_books)
+    popular = np.argsort(-order_counts, kind="stable")
+    popular = popular[order_counts[popular] > 0]
+
+    # Orders as contiguous runs of the sorted arrays
+    _, starts, sizes = np.unique(order_ids, return_index=True, return_counts=True)
+    firsts, seconds = [], []
+    # Orders of the same size form a (orders x size) matrix; every pair of
+    # its columns is a batch of co-purchases. Huge orders are skipped: they
+    # add size^2 pairs and say little about any one book.
+    for size in np.unique(sizes):
+        if size < 2 or size > max_order_size:
+            continue
+        group_starts = starts[sizes == size]
+        matrix = book_ids[group_starts[:, None] + np.arange(size)]
+        left, right = np.triu_indices(size, k=1)
+        a = matrix[:, left].ravel()
+        b = matrix[:, right].ravel()
+        firsts.extend((a, b))
+        seconds.extend((b, a))
+    if not firsts:
+        return RecommendationIndex(np.zeros(num_books + 1, dtype=np.int64), empty, popular, time.time())
+
+    # Sparse co-occurrence counts keyed by book * num_books + partner
+    keys, counts = np.unique(np.concatenate(firsts) * num_books + np.concatenate(seconds), return_counts=True)
+    books, partners = np.divmod(keys, num_books)
+
+    # Best partners first within each book (ties broken by popularity, then ID),
+    # keeping only the top_k of each
+    order = np.lexsort((partners, -order_counts[partners], -counts, books))
+    books, partners = books[order], partners[order]
+    group_start = np.searchsorted(books, books, side="left")
+    keep = np.arange(len(books)) - group_start < top_k
+    books, partners = books[keep], partners[keep]
+
+    indptr = np.zeros(num_books + 1, dtype=np.int64)
+    np.cumsum(np.bincount(books, minlength=num_books), out=indptr[1:])
+    return RecommendationIndex(indptr, partners, popular, time.time())
+
+def refresh_recommendations() -> RecommendationIndex:
+    """Rebuild the index from a replica (or the primary) and swap it in"""
+    global _index
+    db = SessionLocal(bind=replica_router.choose())
+    try:
+        order_ids, book_ids = load_order_lines(db)
+    finally:
+        db.close()
+    _index = build_index(
+        order_ids, book_ids,
+        top_k=settings.RECOMMENDATION_TOP_K,
+        max_order_size=settings.RECOMMENDATION_MAX_ORDER_SIZE
+    )
+    return _index
+
+async def run_recommendation_refresher() -> None:
+    """Background task: build the index at startup, then every RECOMMENDATION_REFRESH_SECONDS"""
+    while True:
+        try:
+            await run_in_threadpool(refresh_recommendations)
+        except Exception as e:
+            print(f"Recommendation index refresh failed: {e}")
+        await asyncio.sleep(settings.RECOMMENDATION_REFRESH_SECONDS)
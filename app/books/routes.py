@@ -1,44 +1,158 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import tempfile
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User
-from app.schemas import Book, BookCreate, BookUpdate
+from starlette.concurrency import run_in_threadpool
+from app.database import get_db, get_read_db, SessionLocal, replica_router
+from app.schemas import Book, BookCreate, BookUpdate, BookPage
+from app.pagination import encode_cursor, decode_cursor
 from app.books.crud import (
-    get_books, get_book, create_book, update_book, 
-    delete_book, get_book_by_isbn
+    get_book_rows, get_book_rows_page, create_book, update_book, 
+    delete_book, get_book_by_isbn, get_book_entry, get_book_entry_by_isbn
 )
-from app.auth.utils import get_current_active_user, get_current_admin_user
+from app.books.cache import get_listing_version
+from app.books.bulk import import_books, iter_import_rows
+from app.books.streaming import STREAM_MEDIA_TYPES, stream_books
+from app.books.recommendations import popular_book_ids, recommended_books, related_book_ids
+from app.responses import ORJSONResponse
+from app.http_cache import make_etag, parse_timestamp, cache_headers, is_not_modified, not_modified
+from app.auth.utils import get_current_admin_user, UserPrincipal
 
 router = APIRouter(prefix="/books", tags=["books"])
 
-@router.get("/", response_model=List[Book])
+@router.get("/", response_model=Union[List[Book], BookPage])
 def read_books(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(
+        None, description="Keyset cursor; pass an empty value for the first page"
+    ),
+    db: Session = Depends(get_read_db)
 ):
     """Get list of books with optional search and pagination"""
-    books = get_books(db, skip=skip, limit=limit, search=search)
-    return books
+    # Validate against the catalogue version before running the list query;
+    # on a replica, its own version, so the ETag always matches the rows
+    version = get_listing_version(db)
+    etag = make_etag([version["etag"], str(request.query_params)])
+    headers = cache_headers(etag, parse_timestamp(version["last_modified"]))
+    if is_not_modified(request, etag, parse_timestamp(version["last_modified"])):
+        return not_modified(headers)
+    
+    # Column-only rows encoded straight to JSON; response_model documents
+    # the shape but rows are not re-validated one by one
+    if cursor is not None:
+        after_id = decode_cursor(cursor).get("id")
+        rows, last_id = get_book_rows_page(db, after_id=after_id, limit=limit, search=search)
+        next_cursor = encode_cursor({"id": last_id}) if last_id is not None else None
+        return ORJSONResponse({"items": rows, "next_cursor": next_cursor}, headers=headers)
+    
+    rows = get_book_rows(db, skip=skip, limit=limit, search=search)
+    return ORJSONResponse(rows, headers=headers)
+
+def stream_in_own_session(fmt: str, **filters):
+    """Stream books from a dedicated session, since the response outlives request dependencies"""
+    db = SessionLocal(bind=replica_router.choose())
+    try:
+        yield from stream_books(db, fmt, **filters)
+    finally:
+        db.close()
+
+@router.get("/stream")
+def stream_book_listing(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|json)$"),
+    search: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, description="Omit for the full catalogue")
+):
+    """Stream a book listing as NDJSON or a chunked JSON array, at flat memory"""
+    return StreamingResponse(
+        stream_in_own_session(fmt, search=search, limit=limit),
+        media_type=STREAM_MEDIA_TYPES[fmt]
+    )
+
+@router.post("/import")
+async def import_books_feed(
+    request: Request,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
+):
+    """Bulk upsert books by ISBN from a CSV or NDJSON request body (admin only)"""
+    # Spool the upload (to disk past 8 MB) so memory stays flat for large feeds
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        return await run_in_threadpool(
+            import_books, db, iter_import_rows(spool, fmt), chunk_size
+        )
+
+@router.get("/export")
+def export_books(
+    fmt: str = Query("ndjson", alias="format", pattern="^(csv|ndjson)$"),
+    current_user: UserPrincipal = Depends(get_current_admin_user)
+):
+    """Stream the whole catalogue as CSV or NDJSON (admin only)"""
+    return StreamingResponse(
+        stream_in_own_session(fmt, active_only=False),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="books.{fmt}"'}
+    )
+
+def book_entry_response(request: Request, entry: dict) -> Response:
+    """Conditional response for a cached book entry"""
+    data = entry["data"]
+    last_modified = parse_timestamp(data["updated_at"] or data["created_at"])
+    headers = cache_headers(entry["etag"], last_modified)
+    if is_not_modified(request, entry["etag"], last_modified):
+        return not_modified(headers)
+    # Already serialized through the Book schema when it was cached
+    return JSONResponse(content=data, headers=headers)
+
+# Declared before /{book_id} so "popular" is not parsed as an ID
+@router.get("/popular", response_model=List[Book])
+def read_popular_books(
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db)
+):
+    """Books in the most paid orders, from the in-memory recommendation index"""
+    # Over-fetch so deactivated books do not leave the list short
+    return ORJSONResponse(recommended_books(db, popular_book_ids(limit * 2), limit))
 
 @router.get("/{book_id}", response_model=Book)
-def read_book(book_id: int, db: Session = Depends(get_db)):
+def read_book(book_id: int, request: Request, db: Session = Depends(get_read_db)):
     """Get a specific book by ID"""
-    book = get_book(db, book_id=book_id)
-    if book is None:
+    entry = get_book_entry(db, book_id=book_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail="Book not found"
+        )
+    return book_entry_response(request, entry)
+
+@router.get("/{book_id}/related", response_model=List[Book])
+def read_related_books(
+    book_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db)
+):
+    """Books most often bought together with this one, topped up with popular books"""
+    if get_book_entry(db, book_id=book_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Book not found"
         )
-    return book
+    candidates = related_book_ids(book_id, limit * 2) + popular_book_ids(limit * 2)
+    return ORJSONResponse(recommended_books(db, candidates, limit, exclude=book_id))
 
 @router.post("/", response_model=Book)
 def create_new_book(
     book: BookCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Create a new book (admin only)"""
     # Check if ISBN already exists
@@ -57,7 +171,7 @@ def update_existing_book(
     book_id: int,
     book: BookUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Update a book (admin only)"""
     # Check if ISBN already exists (if being updated)
@@ -81,7 +195,7 @@ def update_existing_book(
 def delete_existing_book(
     book_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    current_user: UserPrincipal = Depends(get_current_admin_user)
 ):
     """Delete a book (admin only)"""
     success = delete_book(db=db, book_id=book_id)
@@ -93,12 +207,12 @@ def delete_existing_book(
     return {"message": "Book deleted successfully"}
 
 @router.get("/isbn/{isbn}", response_model=Book)
-def read_book_by_isbn(isbn: str, db: Session = Depends(get_db)):
+def read_book_by_isbn(isbn: str, request: Request, db: Session = Depends(get_read_db)):
     """Get a book by ISBN"""
-    book = get_book_by_isbn(db, isbn=isbn)
-    if book is None:
+    entry = get_book_entry_by_isbn(db, isbn=isbn)
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book not found"
         )
-    return book
+    return book_entry_response(request, entry)
@@ -0,0 +1,197 @@
+# Books module - full-text search backends for the book listing
+import re
+from typing import Dict, List
+from sqlalchemy import bindparam, column, event, func, inspect, literal_column, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query, Session
+from app.config import settings
+from app.models import Book
+
+# Expression indexed on PostgreSQL; queries must use the exact same expression
+# for the planner to pick the GIN index.
+BOOK_TSVECTOR_SQL = (
+    "to_tsvector('english', coalesce(books.title, '') || ' ' || "
+    "coalesce(books.author, '') || ' ' || coalesce(books.description, ''))"
+)
+
+def _tokenize(search: str) -> List[str]:
+    """Split a raw search string into lowercase word tokens"""
+    return re.findall(r"\w+", search.lower())
+
+class SearchBackend:
+    """Interface for book search backends"""
+    name = "base"
+
+    def install(self, connection) -> None:
+        """Create the index structures this backend needs (idempotent)"""
+
+    def is_installed(self, connection) -> bool:
+        """Whether install has run on this database"""
+        return True
+
+    def rebuild(self, connection) -> None:
+        """Re-index every book from the books table"""
+
+    def index_book(self, db: Session, book: Book) -> None:
+        """Bring the index up to date for a created or updated book"""
+
+    def index_books(self, db: Session, book_ids: List[int]) -> None:
+        """Bring the index up to date for books written in bulk"""
+
+    def apply(self, query: Query, search: str, ranked: bool = True) -> Query:
+        """Filter (and optionally order by relevance) a Book query"""
+        raise NotImplementedError
+
+class LikeSearchBackend(SearchBackend):
+    """Fallback substring matching for databases without full-text support"""
+    name = "like"
+
+    def apply(self, query: Query, search: str, ranked: bool = True) -> Query:
+        return query.filter(
+            Book.title.ilike(f"%{search}%") |
+            Book.author.ilike(f"%{search}%") |
+            Book.description.ilike(f"%{search}%")
+        )
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector search backed by a GIN expression index"""
+    name = "postgres"
+
+    def install(self, connection) -> None:
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_books_search ON books USING gin (({BOOK_TSVECTOR_SQL}))"
+        ))
+
+    def is_installed(self, connection) -> bool:
+        return connection.execute(text(
+            "SELECT 1 FROM pg_indexes WHERE tablename = 'books' AND indexname = 'ix_books_search'"
+        )).first() is not None
+
+    # The expression index is maintained by PostgreSQL on every INSERT/UPDATE,
+    # so index_book and rebuild have nothing to do.
+
+    def apply(self, query: Query, search: str, ranked: bool = True) -> Query:
+        tokens = _tokenize(search)
+        if not tokens:
+            return query
+        vector = literal_column(BOOK_TSVECTOR_SQL)
+        ts_query = func.to_tsquery(
+            literal_column("'english'"), " & ".join(f"{token}:*" for token in tokens)
+        )
+        query = query.filter(vector.op("@@")(ts_query))
+        if ranked:
+            query = query.order_by(func.ts_rank(vector, ts_query).desc(), Book.id)
+        return query
+
+books_fts = table("books_fts", column("rowid"), column("rank"))
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 virtual table kept in sync by the crud write functions"""
+    name = "sqlite"
+
+    def install(self, connection) -> None:
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+            "title, author, description, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+
+    def is_installed(self, connection) -> bool:
+        return inspect(connection).has_table("books_fts")
+
+    def rebuild(self, connection) -> None:
+        connection.execute(text("DELETE FROM books_fts"))
+        connection.execute(text(
+            "INSERT INTO books_fts (rowid, title, author, description) "
+            "SELECT id, title, author, coalesce(description, '') FROM books"
+        ))
+
+    def index_book(self, db: Session, book: Book) -> None:
+        db.execute(text("DELETE FROM books_fts WHERE rowid = :id"), {"id": book.id})
+        db.execute(
+            text(
+                "INSERT INTO books_fts (rowid, title, author, description) "
+                "VALUES (:id, :title, :author, :description)"
+            ),
+            {
+                "id": book.id,
+                "title": book.title,
+                "author": book.author,
+                "description": book.description or "",
+            }
+        )
+
+    def index_books(self, db: Session, book_ids: List[int]) -> None:
+        if not book_ids:
+            return
+        ids = {"ids": list(book_ids)}
+        db.execute(
+            text("DELETE FROM books_fts WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)),
+            ids
+        )
+        db.execute(
+            text(
+                "INSERT INTO books_fts (rowid, title, author, description) "
+                "SELECT id, title, author, coalesce(description, '') FROM books WHERE id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            ids
+        )
+
+    def apply(self, query: Query, search: str, ranked: bool = True) -> Query:
+        tokens = _tokenize(search)
+        if not tokens:
+            return query
+        query = query.join(books_fts, books_fts.c.rowid == Book.id).filter(
+            text("books_fts MATCH :search_query")
+        ).params(search_query=" ".join(f'"{token}"*' for token in tokens))
+        if ranked:
+            query = query.order_by(books_fts.c.rank, Book.id)
+        return query
+
+_BACKENDS = {
+    "like": LikeSearchBackend,
+    "postgres": PostgresSearchBackend,
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+_instances: Dict[str, SearchBackend] = {}
+
+def get_search_backend(dialect_name: str) -> SearchBackend:
+    """Get the configured search backend for a database dialect"""
+    name = settings.SEARCH_BACKEND
+    if name == "auto":
+        name = dialect_name if dialect_name in _BACKENDS else "like"
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown search backend: {name}")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+def search_backend_for(db: Session) -> SearchBackend:
+    """Get the search backend for the database a session is bound to"""
+    return get_search_backend(db.get_bind().dialect.name)
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create and fully populate the search index for an existing database"""
+    backend = get_search_backend(engine.dialect.name)
+    with engine.begin() as connection:
+        backend.install(connection)
+        backend.rebuild(connection)
+
+def ensure_search_index_installed(engine: Engine) -> bool:
+    """Install and backfill the search index on a database created before it existed
+
+    Returns whether it had to. Databases created by create_all get the index
+    with the books table, so this is a no-op for them.
+    """
+    backend = get_search_backend(engine.dialect.name)
+    with engine.connect() as connection:
+        if not inspect(connection).has_table(Book.__tablename__) or backend.is_installed(connection):
+            return False
+    ensure_search_index(engine)
+    return True
+
+@event.listens_for(Book.__table__, "after_create")
+def _install_search_index(target, connection, **kw) -> None:
+    """Create the search index alongside the books table"""
+    get_search_backend(connection.dialect.name).install(connection)
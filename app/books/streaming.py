@@ -0,0 +1,91 @@
+# Books module - incremental serialization of large book listings
+import csv
+import io
+from typing import Iterable, Iterator, Optional
+from sqlalchemy.orm import Session
+from app.models import Book
+from app.schemas import Book as BookSchema
+from app.books.search import search_backend_for
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+    "csv": "text/csv",
+}
+CSV_FIELDS = list(BookSchema.model_fields)
+
+def iter_books(
+    db: Session,
+    search: Optional[str] = None,
+    active_only: bool = True,
+    limit: Optional[int] = None,
+    batch_size: int = 1000
+) -> Iterable[Book]:
+    """Books in ID order (or relevance order when searching), fetched in batches
+
+    yield_per keeps only one batch of ORM objects alive and uses a
+    server-side cursor on PostgreSQL.
+    """
+    query = db.query(Book)
+    
+    if active_only:
+        query = query.filter(Book.is_active == True)
+    
+    if search:
+        query = search_backend_for(db).apply(query, search)
+    else:
+        query = query.order_by(Book.id)
+    
+    if limit is not None:
+        query = query.limit(limit)
+    
+    return query.yield_per(batch_size)
+
+def _batched_lines(lines: Iterable[str], batch_size: int) -> Iterator[bytes]:
+    """Join lines into byte chunks of batch_size lines each"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield "".join(batch).encode("utf-8")
+            batch = []
+    if batch:
+        yield "".join(batch).encode("utf-8")
+
+def iter_ndjson(books: Iterable[Book], batch_size: int = 1000) -> Iterator[bytes]:
+    """One JSON object per line"""
+    return _batched_lines(
+        (BookSchema.model_validate(book).model_dump_json() + "\n" for book in books),
+        batch_size
+    )
+
+def iter_json_array(books: Iterable[Book], batch_size: int = 1000) -> Iterator[bytes]:
+    """A single JSON array, written element by element"""
+    def elements():
+        separator = ""
+        for book in books:
+            yield separator + BookSchema.model_validate(book).model_dump_json()
+            separator = ","
+    yield b"["
+    yield from _batched_lines(elements(), batch_size)
+    yield b"]"
+
+def iter_csv(books: Iterable[Book], batch_size: int = 1000) -> Iterator[bytes]:
+    """CSV with a header row"""
+    def rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for book in books:
+            writer.writerow(BookSchema.model_validate(book).model_dump(mode="json"))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    return _batched_lines(rows(), batch_size)
+
+ENCODERS = {"ndjson": iter_ndjson, "json": iter_json_array, "csv": iter_csv}
+
+def stream_books(db: Session, fmt: str, batch_size: int = 1000, **filters) -> Iterator[bytes]:
+    """Encode a book listing incrementally, keeping memory flat for any size"""
+    return ENCODERS[fmt](iter_books(db, batch_size=batch_size, **filters), batch_size)
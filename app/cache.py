@@ -0,0 +1,216 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from app.config import settings
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire a fixed time after being set"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a live entry, refreshing its LRU position"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store an entry, evicting the least recently used one when full"""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Drop an entry if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class FakeRedis:
+    """In-process stand-in for the subset of the Redis client API we use
+
+    Selected with CACHE_REDIS_URL=fake:// for tests and local development.
+    Lua scripts cannot run here, so register_script looks up a Python
+    equivalent that the script's owner registered in `scripts`.
+    """
+
+    # Lua source -> function(client, keys, args) behaving the same way
+    scripts: dict = {}
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def _live(self, name):
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[name]
+            return None
+        return entry
+
+    def get(self, name):
+        with self._lock:
+            entry = self._live(name)
+            return entry[0] if entry else None
+
+    def set(self, name, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            entry = self._live(name)
+            value = int(entry[0]) + amount if entry else amount
+            self._data[name] = (str(value).encode("utf-8"), entry[1] if entry else None)
+            return value
+
+    def register_script(self, script):
+        implementation = self.scripts[script]
+
+        def run(keys=(), args=()):
+            # Atomic like EVALSHA: nothing else touches the store meanwhile
+            with self._lock:
+                return implementation(self, list(keys), list(args))
+        return run
+
+class AsyncFakeRedis:
+    """redis.asyncio-style access to a FakeRedis, for callers on the event loop"""
+
+    def __init__(self, client: FakeRedis):
+        self._client = client
+
+    def register_script(self, script):
+        run = self._client.register_script(script)
+
+        async def run_async(keys=(), args=()):
+            return run(keys=keys, args=args)
+        return run_async
+
+_shared_client = None
+_async_shared_client = None
+
+def get_shared_client():
+    """Shared (cross-process) cache client from CACHE_REDIS_URL, or None if unset"""
+    global _shared_client
+    if _shared_client is None and settings.CACHE_REDIS_URL:
+        if settings.CACHE_REDIS_URL.startswith("fake://"):
+            _shared_client = FakeRedis()
+        else:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_REDIS_URL is set but the redis package is not installed")
+            _shared_client = redis.Redis.from_url(
+                settings.CACHE_REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+    return _shared_client
+
+def get_async_shared_client():
+    """redis.asyncio client for the same store as get_shared_client, or None if unset"""
+    global _async_shared_client
+    if _async_shared_client is None and settings.CACHE_REDIS_URL:
+        if settings.CACHE_REDIS_URL.startswith("fake://"):
+            _async_shared_client = AsyncFakeRedis(get_shared_client())
+        else:
+            try:
+                import redis.asyncio
+            except ImportError:
+                raise RuntimeError("CACHE_REDIS_URL is set but the redis package is not installed")
+            _async_shared_client = redis.asyncio.Redis.from_url(
+                settings.CACHE_REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+    return _async_shared_client
+
+class TieredCache:
+    """In-process LRU in front of an optional shared store holding JSON values
+
+    The local tier uses a short TTL because other workers cannot invalidate
+    it; the shared tier is invalidated precisely and may live longer.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, local_ttl: float, shared_ttl: float):
+        self.namespace = namespace
+        self.local = TTLCache(maxsize=maxsize, ttl=local_ttl)
+        self.shared_ttl = shared_ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        shared = get_shared_client()
+        if shared is None:
+            return None
+        try:
+            raw = shared.get(self._key(key))
+        except Exception as e:
+            # A cache outage degrades to database reads, never to errors
+            print(f"Shared cache read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            # A corrupt entry is a miss; drop it so the next fill replaces it
+            print(f"Shared cache entry {self._key(key)} is not valid JSON: {e}")
+            self.delete(key)
+            return None
+        self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        shared = get_shared_client()
+        if shared is not None:
+            try:
+                shared.set(self._key(key), json.dumps(value), ex=int(self.shared_ttl))
+            except Exception as e:
+                print(f"Shared cache write failed: {e}")
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.local.delete(key)
+        shared = get_shared_client()
+        if shared is not None and keys:
+            try:
+                shared.delete(*(self._key(key) for key in keys))
+            except Exception as e:
+                print(f"Shared cache delete failed: {e}")
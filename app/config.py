@@ -1,34 +1,144 @@
 import os
-import sys
 from dotenv import load_dotenv
 
 # Only load .env in development
 if os.getenv("ENVIRONMENT") != "production":
     load_dotenv()
 
+DEFAULT_SECRET_KEY = "your-secret-key-here-change-in-production"
+
 class Settings:
-    # Database - REQUIRED for production
+    # Database - REQUIRED for production (checked by validate() at startup)
     DATABASE_URL: str = os.getenv("DATABASE_URL")
-    if not DATABASE_URL:
-        print("ERROR: DATABASE_URL environment variable is required!")
-        print("Please set DATABASE_URL in your Vercel environment variables.")
-        sys.exit(1)
-    
-    # JWT - REQUIRED for production
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
-    if SECRET_KEY == "your-secret-key-here-change-in-production":
-        print("ERROR: SECRET_KEY must be set to a secure value in production!")
-        print("Please set SECRET_KEY in your Vercel environment variables.")
-        sys.exit(1)
+    
+    # Connection pool - sized for long-lived uvicorn workers. DB_PGBOUNCER hands
+    # pooling to an external PgBouncer (transaction mode) and holds nothing here.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "5"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+    
+    # Read replicas (comma-separated URLs) for read-only routes; replicas that
+    # fail a health check or lag further behind than the limit are skipped
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    REPLICA_HEALTH_CHECK_SECONDS: float = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    
+    # Async database layer (asyncpg / aiosqlite) for routers migrated to AsyncSession
+    ASYNC_DATABASE: bool = os.getenv("ASYNC_DATABASE", "false").lower() == "true"
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL", "")  # Derived from DATABASE_URL when empty
+    
+    # JWT - REQUIRED for production (checked by validate() at startup)
+    SECRET_KEY: str = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
     
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     
+    # Authenticated user lookups - per-process principal cache, and whether
+    # tokens carry enough claims to skip the users table entirely
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+    JWT_EMBED_USER_CLAIMS: bool = os.getenv("JWT_EMBED_USER_CLAIMS", "false").lower() == "true"
+    
+    # Read-through caches - optional shared tier ("redis://..." or "fake://" for tests)
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "")
+    BOOK_CACHE_MAX_SIZE: int = int(os.getenv("BOOK_CACHE_MAX_SIZE", "10000"))
+    BOOK_CACHE_LOCAL_TTL_SECONDS: float = float(os.getenv("BOOK_CACHE_LOCAL_TTL_SECONDS", "30"))
+    BOOK_CACHE_SHARED_TTL_SECONDS: float = float(os.getenv("BOOK_CACHE_SHARED_TTL_SECONDS", "3600"))
+    
+    # HTTP caching of catalogue responses (browsers and nginx)
+    HTTP_CACHE_MAX_AGE_SECONDS: int = int(os.getenv("HTTP_CACHE_MAX_AGE_SECONDS", "30"))
+    
+    # Password hashing - bcrypt cost and the process pool that runs it
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))  # 0 hashes in the threadpool instead
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+    
     # Paystack
     PAYSTACK_SECRET_KEY: str = os.getenv("PAYSTACK_SECRET_KEY", "")
     PAYSTACK_PUBLIC_KEY: str = os.getenv("PAYSTACK_PUBLIC_KEY", "")
+    PAYSTACK_BASE_URL: str = os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
+    PAYSTACK_TIMEOUT_SECONDS: float = float(os.getenv("PAYSTACK_TIMEOUT_SECONDS", "10"))
+    PAYSTACK_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("PAYSTACK_CONNECT_TIMEOUT_SECONDS", "3"))
+    PAYSTACK_MAX_CONNECTIONS: int = int(os.getenv("PAYSTACK_MAX_CONNECTIONS", "20"))
+    PAYSTACK_HTTP2: bool = os.getenv("PAYSTACK_HTTP2", "false").lower() == "true"
+    PAYSTACK_VERIFY_RETRIES: int = int(os.getenv("PAYSTACK_VERIFY_RETRIES", "2"))
+    PAYSTACK_RETRY_BACKOFF_SECONDS: float = float(os.getenv("PAYSTACK_RETRY_BACKOFF_SECONDS", "0.2"))
+    PAYSTACK_BREAKER_THRESHOLD: int = int(os.getenv("PAYSTACK_BREAKER_THRESHOLD", "5"))
+    PAYSTACK_BREAKER_RESET_SECONDS: float = float(os.getenv("PAYSTACK_BREAKER_RESET_SECONDS", "30"))
+    
+    # Stock reservations - how long an unpaid order holds its stock, and how
+    # often the sweeper returns expired or failed holds to the shelf
+    RESERVATION_TTL_MINUTES: float = float(os.getenv("RESERVATION_TTL_MINUTES", "15"))
+    RESERVATION_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("RESERVATION_SWEEP_INTERVAL_SECONDS", "30"))
+    RESERVATION_SWEEP_BATCH_SIZE: int = int(os.getenv("RESERVATION_SWEEP_BATCH_SIZE", "500"))
+    
+    # Paystack webhooks - events are stored on receipt and applied by a pool
+    # of background workers, claimed in batches
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "2"))
+    WEBHOOK_BATCH_SIZE: int = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+    WEBHOOK_POLL_INTERVAL_SECONDS: float = float(os.getenv("WEBHOOK_POLL_INTERVAL_SECONDS", "5"))
+    WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+    
+    # How long an Idempotency-Key replays its first response
+    IDEMPOTENCY_KEY_TTL_HOURS: float = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+    
+    # Rate limiting - one token bucket per client (JWT subject or IP), with
+    # per-route costs; "shared" keeps buckets in CACHE_REDIS_URL so limits
+    # hold across workers. Concurrency caps are per worker (0 = uncapped).
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_PER_SECOND", "10"))
+    RATE_LIMIT_BURST: float = float(os.getenv("RATE_LIMIT_BURST", "40"))
+    # Reverse proxies in front of the app that append to X-Forwarded-For
+    # (1 for the bundled nginx and Render); 0 ignores the header, which
+    # behind a proxy puts every client in the proxy's bucket
+    RATE_LIMIT_TRUSTED_PROXIES: int = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+    CONCURRENCY_LIMIT_LOGIN: int = int(os.getenv("CONCURRENCY_LIMIT_LOGIN", "8"))
+    CONCURRENCY_LIMIT_PAYMENT: int = int(os.getenv("CONCURRENCY_LIMIT_PAYMENT", "32"))
+    CONCURRENCY_LIMIT_SEARCH: int = int(os.getenv("CONCURRENCY_LIMIT_SEARCH", "16"))
+    
+    # Recommendations - co-purchase index rebuilt in memory from paid orders;
+    # orders with more lines than RECOMMENDATION_MAX_ORDER_SIZE are ignored
+    RECOMMENDATION_REFRESH_SECONDS: float = float(os.getenv("RECOMMENDATION_REFRESH_SECONDS", "900"))
+    RECOMMENDATION_TOP_K: int = int(os.getenv("RECOMMENDATION_TOP_K", "50"))
+    RECOMMENDATION_MAX_ORDER_SIZE: int = int(os.getenv("RECOMMENDATION_MAX_ORDER_SIZE", "50"))
+    
+    # Server-rendered pages - per-worker cache of rendered catalogue and
+    # product fragments, keyed by catalogue version
+    PAGE_CACHE_MAX_SIZE: int = int(os.getenv("PAGE_CACHE_MAX_SIZE", "1000"))
+    PAGE_CACHE_TTL_SECONDS: float = float(os.getenv("PAGE_CACHE_TTL_SECONDS", "600"))
+    
+    # Search - "auto" picks the full-text backend matching the database dialect
+    SEARCH_BACKEND: str = os.getenv("SEARCH_BACKEND", "auto")
+    
+    # Observability - /metrics endpoint, and an opt-in sampling profiler that
+    # writes collapsed stacks for requests slower than the threshold (0 = off)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    PROFILE_SLOW_REQUEST_MS: float = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    
+    # Startup warmup - connections each worker opens before reporting healthy
+    DB_WARMUP_CONNECTIONS: int = int(os.getenv("DB_WARMUP_CONNECTIONS", "4"))
     
     # Environment
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "production")
+    
+    def validate(self) -> None:
+        """Refuse to start without required settings
+
+        Called from the app lifespan rather than at import, so tools and
+        scripts can import the app without a full production environment.
+        """
+        problems = []
+        if not self.DATABASE_URL:
+            problems.append("DATABASE_URL environment variable is required!")
+        if self.SECRET_KEY == DEFAULT_SECRET_KEY:
+            problems.append("SECRET_KEY must be set to a secure value in production!")
+        if problems:
+            raise RuntimeError(" ".join(problems))
 
 settings = Settings()
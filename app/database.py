@@ -1,35 +1,90 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager, contextmanager
+from typing import Iterable, List, Sequence
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-
-# Get DATABASE_URL from environment
-database_url = os.getenv("DATABASE_URL")
-
-if not database_url:
-    raise ValueError("DATABASE_URL environment variable is required!")
-
-# Create database engine with proper connection pooling for production
-if database_url.startswith("sqlite"):
-    engine = create_engine(
-        database_url, 
-        connect_args={"check_same_thread": False}
-    )
-else:
-    # PostgreSQL configuration optimized for Vercel serverless
-    engine = create_engine(
-        database_url,
-        pool_size=5,  # Smaller pool for serverless
-        max_overflow=10,  # Reduced overflow for serverless
-        pool_pre_ping=True,  # Test connections before use
-        pool_recycle=300,  # Recycle connections every 5 minutes
-        connect_args={
-            "connect_timeout": 10,  # 10 second connection timeout
-            "options": "-c timezone=utc"  # Set timezone to UTC
-        }
-    )
-    
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+import threading
+import uuid
+from app.config import settings
+from app.metrics import InstrumentedQueuePool, instrument_engine
+
+def pool_options() -> dict:
+    """Pool arguments for create_engine, driven by Settings
+
+    With DB_PGBOUNCER the external PgBouncer owns pooling, so each checkout
+    opens a fresh (cheap) connection to it and nothing is held here.
+    """
+    if settings.DB_PGBOUNCER:
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,  # Fail fast (503) instead of queueing
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,  # Costs a round trip per checkout
+    }
+
+def create_db_engine(url: str):
+    """Create an instrumented engine with the configured pool"""
+    if url.startswith("sqlite"):
+        if ":memory:" in url:
+            # In-memory databases need SQLite's default single-connection pool
+            sqlite_pool = {}
+        else:
+            sqlite_pool = {**pool_options(), "poolclass": InstrumentedQueuePool}
+        db_engine = create_engine(
+            url, 
+            connect_args={"check_same_thread": False},
+            **sqlite_pool
+        )
+    else:
+        # PostgreSQL configuration for long-lived uvicorn workers
+        db_engine = create_engine(
+            url,
+            connect_args={
+                "connect_timeout": 10,  # 10 second connection timeout
+                "options": "-c timezone=utc"  # Set timezone to UTC
+            },
+            # InstrumentedQueuePool records checkout wait for /metrics; a
+            # NullPool from pool_options (PgBouncer mode) takes precedence
+            **{"poolclass": InstrumentedQueuePool, **pool_options()}
+        )
+    instrument_engine(db_engine)
+    return db_engine
+
+# The primary engine is built on first use (or by the lifespan warmup), so
+# importing the app neither needs DATABASE_URL nor loads a database driver
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Get the primary engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if not settings.DATABASE_URL:
+                    raise ValueError("DATABASE_URL environment variable is required!")
+                _engine = create_db_engine(settings.DATABASE_URL)
+    return _engine
+
+def __getattr__(name: str):
+    # `from app.database import engine` keeps working, resolved lazily
+    if name == "engine":
+        return get_engine()
+    if name == "database_url":
+        return settings.DATABASE_URL
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class PrimarySession(Session):
+    """Session bound to the primary engine unless another bind is given"""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
+
+SessionLocal = sessionmaker(class_=PrimarySession, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
@@ -39,4 +94,291 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+class ReplicaRouter:
+    """Round-robin over read replicas, skipping unhealthy or lagging ones
+
+    A replica is taken out of rotation when a connection to it fails, or
+    when check_health() finds it unreachable or more than
+    REPLICA_MAX_LAG_SECONDS behind the primary. With no replica available
+    reads fall back to the primary.
+    """
+
+    def __init__(self, urls: Sequence[str]):
+        self.urls = list(urls)
+        self._engines = None
+        self._healthy = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def engines(self) -> list:
+        """Replica engines, created on first use"""
+        if self._engines is None:
+            with self._lock:
+                if self._engines is None:
+                    engines = [create_db_engine(url) for url in self.urls]
+                    for replica in engines:
+                        self._healthy[id(replica)] = True
+                        event.listen(replica, "handle_error", self._on_error)
+                    self._engines = engines
+        return self._engines
+
+    def _on_error(self, context) -> None:
+        if context.is_disconnect or context.connection is None:
+            self._healthy[id(context.engine)] = False
+
+    def choose_replica(self):
+        """The next healthy replica, or None"""
+        engines = self.engines
+        with self._lock:
+            for _ in range(len(engines)):
+                replica = engines[self._next]
+                self._next = (self._next + 1) % len(engines)
+                if self._healthy[id(replica)]:
+                    return replica
+        return None
+
+    def choose(self):
+        """The next healthy replica, or the primary engine"""
+        return self.choose_replica() or get_engine()
+
+    def check_health(self) -> None:
+        """Probe every replica and update the rotation"""
+        for replica in self.engines:
+            try:
+                with replica.connect() as connection:
+                    healthy = True
+                    if replica.dialect.name == "postgresql" and settings.REPLICA_MAX_LAG_SECONDS > 0:
+                        # Caught up (nothing received is left to replay) counts as
+                        # no lag: the replay timestamp stops moving when the
+                        # primary is idle, so now() - it alone keeps growing
+                        lag = connection.execute(text(
+                            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                        )).scalar()
+                        healthy = lag is None or lag <= settings.REPLICA_MAX_LAG_SECONDS
+            except SQLAlchemyError as e:
+                print(f"Replica {replica.url.render_as_string(hide_password=True)} unavailable: {e}")
+                healthy = False
+            self._healthy[id(replica)] = healthy
+
+    def stats(self) -> List[dict]:
+        return [
+            {
+                "url": replica.url.render_as_string(hide_password=True),
+                "healthy": self._healthy[id(replica)],
+                "pool": pool_stats(replica),
+            }
+            for replica in self.engines
+        ]
+
+replica_router = ReplicaRouter([url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()])
+
+def get_read_db():
+    """Dependency to get a session for read-only routes, bound to a replica when configured
+
+    Replicas trail the primary, so flows that read their own writes (order
+    creation, checkout, payment verification) must keep using get_db.
+    """
+    db = SessionLocal(bind=replica_router.choose())
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def primary_session(db: Session):
+    """db itself when it is bound to the primary, otherwise a short-lived primary session
+
+    Use it for reads whose results are cached: a row read from a lagging
+    replica would otherwise be served long after the replica caught up.
+    """
+    if db.get_bind() is get_engine():
+        yield db
+        return
+    primary = SessionLocal()
+    try:
+        yield primary
+    finally:
+        primary.close()
+
+# Async engine for routers migrated to AsyncSession (ASYNC_DATABASE=true).
+# Built on first use so sync-only deployments need neither asyncpg nor aiosqlite.
+_async_engine = None
+_AsyncSessionLocal = None
+
+def pool_stats(bind=None) -> dict:
+    """Connection pool occupancy, for the health endpoint"""
+    pool = (bind or get_engine()).pool
+    if isinstance(pool, NullPool):
+        return {"class": "NullPool"}
+    if not hasattr(pool, "checkedout"):
+        return {"class": type(pool).__name__}
+    return {
+        "class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+    }
+
+def warm_pool(connections: int) -> int:
+    """Open up to `connections` pooled connections to the primary ahead of traffic
+
+    They are all checked out at once so the pool really holds that many
+    afterwards; returns how many were opened.
+    """
+    db_engine = get_engine()
+    if isinstance(db_engine.pool, NullPool):
+        connections = 1  # Nothing to keep; just prove the database is reachable
+    elif hasattr(db_engine.pool, "size"):
+        connections = min(connections, db_engine.pool.size())
+    opened = []
+    try:
+        for _ in range(max(connections, 1)):
+            connection = db_engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+def to_async_url(url: str) -> str:
+    """The same database URL with its driver swapped for asyncpg / aiosqlite"""
+    scheme, rest = url.split("://", 1)
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme.startswith("postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+def get_async_database_url() -> str:
+    """Async driver URL: ASYNC_DATABASE_URL, or DATABASE_URL with its driver swapped"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return to_async_url(settings.DATABASE_URL)
+
+def create_async_db_engine(async_url: str):
+    """Create an instrumented async engine with the configured pool"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    
+    if async_url.startswith("sqlite"):
+        async_engine = create_async_engine(async_url)
+    else:
+        connect_args = {
+            "timeout": 10,  # 10 second connection timeout
+            "server_settings": {"timezone": "utc"}
+        }
+        if settings.DB_PGBOUNCER:
+            # Transaction pooling hands each transaction to any server
+            # connection, so asyncpg must not rely on prepared statements
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        async_engine = create_async_engine(
+            async_url,
+            connect_args=connect_args,
+            **pool_options()
+        )
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+def get_async_engine():
+    """Get the shared async engine, creating it on first use"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        
+        _async_engine = create_async_db_engine(get_async_database_url())
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+# Async engines for the read replicas, keyed by replica URL; which replica
+# to use follows the sync ReplicaRouter's rotation and health checks
+_async_replica_engines = {}
+
+def get_async_read_engine():
+    """Async engine for the next healthy replica, or the primary async engine"""
+    replica = replica_router.choose_replica()
+    if replica is None:
+        return get_async_engine()
+    url = replica.url.render_as_string(hide_password=False)
+    if url not in _async_replica_engines:
+        _async_replica_engines[url] = create_async_db_engine(to_async_url(url))
+    return _async_replica_engines[url]
+
+async def get_async_db():
+    """Dependency to get an async database session"""
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Async counterpart of get_read_db, bound to a replica when configured"""
+    get_async_engine()
+    async with _AsyncSessionLocal(bind=get_async_read_engine()) as db:
+        yield db
+
+@asynccontextmanager
+async def async_primary_session(db):
+    """Async counterpart of primary_session"""
+    if db.bind is get_async_engine():
+        yield db
+        return
+    async with _AsyncSessionLocal() as primary:
+        yield primary
+
+def insert_on_conflict_update(
+    db,
+    model,
+    rows: List[dict],
+    index_elements: Sequence[str],
+    update_columns: Iterable[str],
+    increment_columns: Iterable[str] = (),
+    **extra_set
+):
+    """Build a multi-row INSERT ... ON CONFLICT DO UPDATE for PostgreSQL or SQLite
+
+    update_columns are taken from the incoming row (EXCLUDED), and
+    increment_columns are added to the stored value; extra_set adds literal
+    SET values such as updated_at=func.now(), which ON CONFLICT updates do
+    not apply on their own.
+    """
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
+    
+    statement = insert(model).values(rows)
+    set_ = {column: statement.excluded[column] for column in update_columns}
+    for column in increment_columns:
+        set_[column] = getattr(model, column) + statement.excluded[column]
+    set_.update(extra_set)
+    return statement.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
+
+# Bound parameters one statement may carry where the driver cannot report it:
+# PostgreSQL's wire protocol limit, else SQLite's old compiled-in default
+MAX_BOUND_PARAMETERS = {"postgresql": 65535}
+DEFAULT_MAX_BOUND_PARAMETERS = 999
+
+def rows_per_statement(db, model) -> int:
+    """How many rows of model one multi-row INSERT can bind on db's database"""
+    dialect_name = db.get_bind().dialect.name
+    limit = MAX_BOUND_PARAMETERS.get(dialect_name, DEFAULT_MAX_BOUND_PARAMETERS)
+    if dialect_name == "sqlite":
+        # Set at compile time (32766 by default since 3.32); ask the connection
+        import sqlite3
+        dbapi_connection = db.connection().connection.dbapi_connection
+        if hasattr(dbapi_connection, "getlimit"):
+            limit = dbapi_connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    return max(limit // len(model.__table__.columns), 1)
@@ -0,0 +1,57 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from app.config import settings
+
+def make_etag(value: Any) -> str:
+    """Strong ETag for any JSON-serializable value"""
+    raw = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO timestamp, treating naive values as UTC"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """Validator and freshness headers for a cacheable GET response"""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match, then If-Modified-Since (RFC 9110 precedence)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        weak_etag = "W/" + etag
+        return "*" in candidates or etag in candidates or weak_etag in candidates
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            if since.tzinfo is None:
+                # "-0000" dates parse as naive; they are UTC all the same
+                since = since.replace(tzinfo=timezone.utc)
+            # HTTP dates have one-second resolution
+            return last_modified.replace(microsecond=0) <= since
+        except (TypeError, ValueError):
+            # An unusable date is ignored, as if the header were absent
+            return False
+    return False
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Empty 304 carrying the validators"""
+    return Response(status_code=304, headers=headers)
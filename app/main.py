@@ -1,17 +1,96 @@
-from fastapi import FastAPI, Request
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import engine
+from app.database import get_engine, get_read_db, pool_stats, replica_router, warm_pool
 from app import models
 from app.auth.routes import router as auth_router
 from app.books.routes import router as books_router
 from app.orders.routes import router as orders_router
+from app.analytics.routes import router as analytics_router
+from app.orders.paystack import paystack_client
+from app.orders.reservations import run_reservation_sweeper
+from app.orders.idempotency import run_idempotency_key_purge
+from app.orders.webhooks import start_webhook_workers
+from app.books.recommendations import run_recommendation_refresher
+from app.auth.hashing import shutdown_hashing_pool
+from app.responses import ORJSONResponse
+from app.ratelimit import RateLimitMiddleware
+from app.metrics import MetricsMiddleware, render_metrics
+from app.profiling import get_profiler
+from app.templating import get_templates, precompile_templates
+from app.books.crud import get_book_entry
+from app.books.search import ensure_search_index_installed
+from app.pages import book_fragment, catalogue_fragment
 
-# Database tables should be created separately, not at startup
-# Run create_tables.py locally once to create tables
-# models.Base.metadata.create_all(bind=engine)  # REMOVED: Causes crashes on Vercel
+# Tables are not created at import (that crashed serverless deployments):
+# run seed_database.py once to create the schema. Tables and indexes added
+# since are installed on existing databases by the startup warmup.
+
+async def monitor_replicas():
+    """Re-check read replica health in the background"""
+    while True:
+        await asyncio.sleep(settings.REPLICA_HEALTH_CHECK_SECONDS)
+        try:
+            await run_in_threadpool(replica_router.check_health)
+        except Exception as e:
+            # Keep monitoring; replicas not probed keep their last known health
+            print(f"Replica health check failed: {e}")
+
+# /health reports 503 "starting" until the warmup has succeeded
+WARMUP_RETRY_SECONDS = 2
+warmup_state = {"ready": False, "error": None}
+
+def warm_up() -> None:
+    """Open pool connections and build lazily created resources ahead of traffic"""
+    warm_pool(settings.DB_WARMUP_CONNECTIONS)
+    created = models.ensure_schema_installed(get_engine())
+    if created:
+        print(f"Installed missing schema: {', '.join(created)}")
+    # Databases from before full-text search get their index on first start
+    if ensure_search_index_installed(get_engine()):
+        print("Search index installed and backfilled")
+    if replica_router.urls:
+        replica_router.check_health()
+    precompile_templates()
+
+async def run_warmup() -> None:
+    """Background task: retry the warmup until it succeeds, then report ready"""
+    while True:
+        try:
+            await run_in_threadpool(warm_up)
+        except Exception as e:
+            warmup_state["error"] = f"{e.__class__.__name__}: {e}"
+            print(f"Startup warmup failed: {e}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+        else:
+            warmup_state.update(ready=True, error=None)
+            return
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Validate settings, warm up and start background tasks, and release pooled resources when the worker stops"""
+    settings.validate()
+    tasks = [
+        asyncio.create_task(run_warmup()),
+        asyncio.create_task(run_reservation_sweeper()),
+        asyncio.create_task(run_idempotency_key_purge()),
+        asyncio.create_task(run_recommendation_refresher()),
+        *start_webhook_workers(),
+    ]
+    if replica_router.urls:
+        tasks.append(asyncio.create_task(monitor_replicas()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await paystack_client.aclose()
+    shutdown_hashing_pool()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -19,9 +98,15 @@ app = FastAPI(
     description="A complete bookstore management system with authentication and payments",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Rate limits and concurrency caps (inside CORS, so rejections carry CORS headers)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,58 +116,105 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static files and templates
+# Per-route latency, SQL and Paystack timings for /metrics (outermost, so it
+# times everything below it)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, profiler=get_profiler())
+
+# Static files (templates are loaded by app.templating)
 import os
 if os.path.exists("app/static"):
     app.mount("/static", StaticFiles(directory="app/static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
 
 # Include routers
 app.include_router(auth_router)
+if settings.ASYNC_DATABASE:
+    # Async read endpoints take precedence over their sync counterparts in books_router
+    from app.books.async_routes import router as async_books_router
+    app.include_router(async_books_router)
 app.include_router(books_router)
 app.include_router(orders_router)
+app.include_router(analytics_router)
 
 @app.get("/")
-async def root(request: Request):
-    """Root endpoint - redirect to index page"""
-    return templates.TemplateResponse("index.html", {"request": request})
+def root(request: Request, db: Session = Depends(get_read_db)):
+    """Root endpoint - the index page, with the catalogue rendered in"""
+    return get_templates().TemplateResponse(request, "index.html", {"catalogue_html": catalogue_fragment(db)})
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Shed load when no database connection frees up within DB_POOL_TIMEOUT_SECONDS"""
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "environment": settings.ENVIRONMENT}
+    """Health check endpoint (503 until the startup warmup has finished)"""
+    if not warmup_state["ready"]:
+        return ORJSONResponse(
+            status_code=503,
+            content={
+                "status": "starting",
+                "environment": settings.ENVIRONMENT,
+                "error": warmup_state["error"]
+            }
+        )
+    return {
+        "status": "healthy",
+        "environment": settings.ENVIRONMENT,
+        "database_pool": pool_stats(),
+        "replicas": replica_router.stats()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # Template routes for frontend
 @app.get("/index")
-async def index_page(request: Request):
-    """Home page showing all books"""
-    return templates.TemplateResponse("index.html", {"request": request})
+def index_page(request: Request, db: Session = Depends(get_read_db)):
+    """Home page showing all books, with the first page rendered in"""
+    return get_templates().TemplateResponse(request, "index.html", {"catalogue_html": catalogue_fragment(db)})
+
+@app.get("/book/{book_id}")
+def book_page(request: Request, book_id: int, db: Session = Depends(get_read_db)):
+    """Product page with the book and related books rendered in"""
+    entry = get_book_entry(db, book_id=book_id)
+    if entry is None or not entry["data"]["is_active"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Book not found")
+    return get_templates().TemplateResponse(request, "book.html", {
+        "title": entry["data"]["title"],
+        "book_html": book_fragment(db, entry["data"])
+    })
 
 @app.get("/login")
 async def login_page(request: Request):
     """Login page"""
-    return templates.TemplateResponse("login.html", {"request": request})
+    return get_templates().TemplateResponse(request, "login.html")
 
 @app.get("/admin")
 async def admin_page(request: Request):
     """Admin panel for book management"""
-    return templates.TemplateResponse("admin.html", {"request": request})
+    return get_templates().TemplateResponse(request, "admin.html")
 
 @app.get("/cart")
 async def cart_page(request: Request):
     """Shopping cart page"""
-    return templates.TemplateResponse("cart.html", {"request": request})
+    return get_templates().TemplateResponse(request, "cart.html")
 
 @app.get("/orders")
 async def orders_page(request: Request):
     """Orders page showing user's orders"""
-    return templates.TemplateResponse("orders.html", {"request": request})
+    return get_templates().TemplateResponse(request, "orders.html")
 
 @app.get("/checkout/{order_id}")
 async def checkout_page(request: Request, order_id: int):
     """Checkout page for order payment"""
-    return templates.TemplateResponse("checkout.html", {
-        "request": request, 
+    return get_templates().TemplateResponse(request, "checkout.html", {
         "order_id": order_id
     })
 
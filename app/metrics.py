@@ -0,0 +1,203 @@
+import bisect
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Latency buckets in seconds, from a cache hit to a stuck gateway call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """Thread-safe Prometheus histogram with a fixed label set"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_pairs = ",".join(pairs + ['le="%s"' % le])
+                lines.append(f"{self.name}_bucket{{{bucket_pairs}}} {cumulative}")
+            label_text = f"{{{','.join(pairs)}}}" if pairs else ""
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status")
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request",
+    ("method", "route"), buckets=COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request", ("method", "route")
+)
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time", ("operation",)
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection"
+)
+PAYSTACK_REQUEST_DURATION = Histogram(
+    "paystack_request_duration_seconds", "Outbound Paystack API call time", ("operation", "outcome")
+)
+REGISTRY = [
+    REQUEST_DURATION,
+    REQUEST_DB_STATEMENTS,
+    REQUEST_DB_SECONDS,
+    DB_STATEMENT_DURATION,
+    DB_POOL_CHECKOUT_WAIT,
+    PAYSTACK_REQUEST_DURATION,
+]
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class RequestStats:
+    """Time accounting for the request currently being served"""
+    __slots__ = ("db_statements", "db_seconds", "paystack_seconds", "pool_wait_seconds")
+
+    def __init__(self):
+        self.db_statements = 0
+        self.db_seconds = 0.0
+        self.paystack_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+# Threadpool endpoints run in a copy of the request context, so they update
+# the same RequestStats object the middleware created.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+# Database instrumentation
+
+_OPERATION_RE = re.compile(r"\s*(\w+)")
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    elapsed = time.perf_counter() - started
+    match = _OPERATION_RE.match(statement)
+    DB_STATEMENT_DURATION.observe(elapsed, match.group(1).upper() if match else "OTHER")
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_statements += 1
+        stats.db_seconds += elapsed
+
+def instrument_engine(engine) -> None:
+    """Time every statement an engine executes"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a free connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_POOL_CHECKOUT_WAIT.observe(elapsed)
+            stats = current_request.get()
+            if stats is not None:
+                stats.pool_wait_seconds += elapsed
+
+def observe_paystack(operation: str, outcome: str, elapsed: float) -> None:
+    """Record one outbound Paystack call"""
+    PAYSTACK_REQUEST_DURATION.observe(elapsed, operation, outcome)
+    stats = current_request.get()
+    if stats is not None:
+        stats.paystack_seconds += elapsed
+
+# Middleware
+
+class MetricsMiddleware:
+    """Per-route latency and resource accounting for every HTTP request
+
+    Adds a Server-Timing header (total, db, paystack, pool wait) so slow
+    requests can be broken down from the browser or a load-test log, and
+    hands requests slower than PROFILE_SLOW_REQUEST_MS to the sampling
+    profiler when it is enabled.
+    """
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        profile_started = self.profiler.request_started() if self.profiler else None
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", (
+                    f"app;dur={elapsed_ms:.1f}, "
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_statements} statements", '
+                    f"paystack;dur={stats.paystack_seconds * 1000:.1f}, "
+                    f"pool;dur={stats.pool_wait_seconds * 1000:.1f}"
+                ).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            REQUEST_DURATION.observe(elapsed, method, route_path, str(status_code))
+            REQUEST_DB_STATEMENTS.observe(stats.db_statements, method, route_path)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route_path)
+            if profile_started is not None:
+                self.profiler.request_finished(profile_started, f"{method} {route_path}", elapsed)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum
+from typing import List
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text, Enum, Index, UniqueConstraint, inspect
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -13,6 +14,17 @@ class OrderStatus(str, enum.Enum):
     COMPLETED = "completed"
     CANCELLED = "cancelled"
 
+class ReservationStatus(str, enum.Enum):
+    HELD = "held"
+    CONVERTED = "converted"
+    RELEASED = "released"
+
+class WebhookEventStatus(str, enum.Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    PROCESSED = "processed"
+    FAILED = "failed"
+
 class PaymentStatus(str, enum.Enum):
     PENDING = "pending"
     SUCCESS = "success"
@@ -66,6 +78,10 @@ class Order(Base):
     # Relationships
     user = relationship("User", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    reservations = relationship("StockReservation", back_populates="order", cascade="all, delete-orphan")
+    
+    # Keyset pagination of a user's order history
+    __table_args__ = (Index("ix_orders_user_id_id", "user_id", "id"),)
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -80,6 +96,25 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="order_items")
     book = relationship("Book", back_populates="order_items")
 
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(Enum(ReservationStatus), default=ReservationStatus.HELD, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    order = relationship("Order", back_populates="reservations")
+    book = relationship("Book")
+    
+    # The sweeper scans held reservations by expiry
+    __table_args__ = (Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),)
+
 class Payment(Base):
     __tablename__ = "payments"
     
@@ -95,3 +130,81 @@ class Payment(Base):
     
     # Relationships
     order = relationship("Order")
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, nullable=False)  # Endpoint, plus the caller where there is one
+    key = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+    response = Column(Text)  # JSON body, NULL while the first request is in flight
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    
+    __table_args__ = (UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),)
+
+class PaystackEvent(Base):
+    __tablename__ = "paystack_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_key = Column(String, unique=True, nullable=False)  # Deduplicates redeliveries
+    event_type = Column(String, nullable=False)
+    reference = Column(String, index=True)
+    payload = Column(Text, nullable=False)  # Raw signed body
+    status = Column(Enum(WebhookEventStatus), default=WebhookEventStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text)
+    available_at = Column(DateTime(timezone=True), nullable=False)  # Next attempt, or claim lease expiry
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True))
+    
+    # Workers claim due events in order
+    __table_args__ = (Index("ix_paystack_events_status_available_at", "status", "available_at"),)
+
+class BookDailySales(Base):
+    __tablename__ = "book_daily_sales"
+    
+    book_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Per-book, per-day sales, maintained as orders are paid; dashboards
+    # read this instead of joining orders and order_items
+    __table_args__ = (Index("ix_book_daily_sales_day", "day"),)
+
+# Schema added after the first release. Databases created before it get it
+# from the startup warmup: create_all only creates whole missing tables, so
+# indexes added to existing tables are listed separately.
+ADDED_TABLES = [
+    StockReservation.__table__,
+    IdempotencyKey.__table__,
+    PaystackEvent.__table__,
+    BookDailySales.__table__,
+]
+ADDED_INDEXES = [
+    index for index in Order.__table__.indexes if index.name == "ix_orders_user_id_id"
+]
+
+def ensure_schema_installed(engine) -> List[str]:
+    """Create the added tables and indexes a database is missing; returns their names
+
+    A database without the original tables is left alone: it has not been
+    set up yet, and create_all (seed_database.py) creates everything.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(Order.__tablename__):
+        return []
+    created = []
+    missing_tables = [table for table in ADDED_TABLES if not inspector.has_table(table.name)]
+    if missing_tables:
+        # Also creates the tables' own indexes (and enum types on PostgreSQL)
+        Base.metadata.create_all(bind=engine, tables=missing_tables, checkfirst=True)
+        created.extend(table.name for table in missing_tables)
+    for index in ADDED_INDEXES:
+        existing = {existing["name"] for existing in inspector.get_indexes(index.table.name)}
+        if index.name not in existing:
+            index.create(bind=engine, checkfirst=True)
+            created.append(index.name)
+    return created
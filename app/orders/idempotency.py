@@ -0,0 +1,118 @@
+# Orders module - Idempotency-Key handling for payment endpoints
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.models import IdempotencyKey
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+def _expired_before() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+def claim_idempotency_key(db: Session, scope: str, key: str, request_hash: str) -> Optional[dict]:
+    """Claim a key for a new request, or get the response stored for it
+
+    Returns None when the caller owns the key and should run the request.
+    Raises 409 while the first request with the key is still running, and
+    422 when the key is reused for a different request.
+    """
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.created_at < _expired_before()
+    ).delete(synchronize_session=False)
+    db.add(IdempotencyKey(scope=scope, key=key, request_hash=request_hash))
+    try:
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+
+    existing = db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope, IdempotencyKey.key == key
+    ).first()
+    if existing is None:
+        # Released by a failed first attempt in the meantime
+        return claim_idempotency_key(db, scope, key, request_hash)
+    if existing.request_hash != request_hash:
+        raise HTTPException(
+            status_code=422,  # Named differently across Starlette versions
+            detail=f"{IDEMPOTENCY_KEY_HEADER} was already used for a different request"
+        )
+    if existing.response is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A request with this {IDEMPOTENCY_KEY_HEADER} is still in progress",
+            headers={"Retry-After": "1"}
+        )
+    return json.loads(existing.response)
+
+def store_idempotent_response(db: Session, scope: str, key: str, response: dict) -> None:
+    """Save the response to replay for a claimed key"""
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope, IdempotencyKey.key == key
+    ).update({"response": json.dumps(response)}, synchronize_session=False)
+    db.commit()
+
+def release_idempotency_key(db: Session, scope: str, key: str) -> None:
+    """Forget a claimed key after a failed attempt so the client can retry"""
+    db.rollback()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.response.is_(None)
+    ).delete(synchronize_session=False)
+    db.commit()
+
+async def run_idempotent(
+    db: Session,
+    scope: str,
+    key: Optional[str],
+    request_body: str,
+    operation: Callable[[], Awaitable]
+):
+    """Run operation once per (scope, key); retries with the same key replay its response"""
+    if not key:
+        return await operation()
+
+    request_hash = hashlib.sha256(request_body.encode()).hexdigest()
+    replay = await run_in_threadpool(claim_idempotency_key, db, scope, key, request_hash)
+    if replay is not None:
+        return replay
+    try:
+        response = jsonable_encoder(await operation())
+    except BaseException:
+        await run_in_threadpool(release_idempotency_key, db, scope, key)
+        raise
+    await run_in_threadpool(store_idempotent_response, db, scope, key, response)
+    return response
+
+def purge_idempotency_keys() -> int:
+    """Delete keys older than IDEMPOTENCY_KEY_TTL_HOURS"""
+    db = SessionLocal()
+    try:
+        deleted = db.query(IdempotencyKey).filter(
+            IdempotencyKey.created_at < _expired_before()
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+async def run_idempotency_key_purge() -> None:
+    """Background task: purge expired keys hourly"""
+    while True:
+        try:
+            await run_in_threadpool(purge_idempotency_keys)
+        except Exception as e:
+            print(f"Idempotency key purge failed: {e}")
+        await asyncio.sleep(3600)
@@ -1,27 +1,73 @@
+# Orders module - Paystack payment initiation and verification
+import asyncio
+import json
 import uuid
-import requests
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Dict, Optional
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.models import Order, Payment, PaymentStatus
 from app.schemas import PaymentInitiate, PaymentResponse
 from app.config import settings
+from app.database import SessionLocal
+from app.orders.paystack import paystack_client
+from app.orders.reservations import convert_reservations, expire_reservations
+from app.analytics.aggregates import record_order_sales
+
+# Paystack transaction statuses that settle a payment; anything else
+# (ongoing, pending, processing, queued, abandoned) leaves it pending
+PAYSTACK_STATUSES = {
+    "success": PaymentStatus.SUCCESS,
+    "failed": PaymentStatus.FAILED,
+    "reversed": PaymentStatus.FAILED,
+}
+FINAL_PAYMENT_STATUSES = (PaymentStatus.SUCCESS, PaymentStatus.FAILED)
+
+# reference -> verification running in this worker
+_verifications_in_flight: Dict[str, asyncio.Future] = {}
 
 def generate_payment_reference() -> str:
     """Generate a unique payment reference"""
     return f"PAY_{uuid.uuid4().hex[:10].upper()}"
 
-def initiate_paystack_payment(
-    db: Session, 
+def _store_payment(
+    db: Session,
+    order_id: int,
+    reference: str,
+    amount: float,
+    data: dict,
+    raw_response: str
+) -> None:
+    """Store a pending payment record for an initiated transaction"""
+    payment = Payment(
+        order_id=order_id,
+        reference=reference,
+        amount=amount,
+        status=PaymentStatus.PENDING,
+        paystack_reference=data.get("reference"),
+        gateway_response=raw_response
+    )
+
+    db.add(payment)
+    db.commit()
+
+async def initiate_paystack_payment(
+    db: Session,
     payment_data: PaymentInitiate,
-    order: Order
+    order_id: int,
+    user_id: int
 ) -> PaymentResponse:
-    """Initiate payment with Paystack"""
+    """Initiate payment with Paystack
+
+    Takes plain IDs rather than the Order: this runs on the event loop, where
+    touching an expired instance would load it with a blocking query.
+    """
     if not settings.PAYSTACK_SECRET_KEY:
         raise Exception("Paystack secret key not configured")
-    
+
     # Generate payment reference
     reference = generate_payment_reference()
-    
+
     # Prepare Paystack payload
     payload = {
         "email": payment_data.email,
@@ -29,102 +75,123 @@ def initiate_paystack_payment(
         "reference": reference,
         "callback_url": payment_data.callback_url or "http://localhost:8000/orders/payment/callback",
         "metadata": {
-            "order_id": order.id,
-            "user_id": order.user_id
+            "order_id": order_id,
+            "user_id": user_id
         }
     }
-    
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-    
+
     # Make request to Paystack
-    response = requests.post(
-        "https://api.paystack.co/transaction/initialize",
-        json=payload,
-        headers=headers
-    )
-    
-    if response.status_code != 200:
-        raise Exception(f"Paystack API error: {response.text}")
-    
-    paystack_response = response.json()
-    
-    if not paystack_response.get("status"):
-        raise Exception(f"Paystack error: {paystack_response.get('message')}")
-    
-    data = paystack_response["data"]
-    
+    data, raw_response = await paystack_client.initialize_transaction(payload)
+
     # Store payment record
-    payment = Payment(
-        order_id=order.id,
-        reference=reference,
-        amount=payment_data.amount,
-        status=PaymentStatus.PENDING,
-        paystack_reference=data.get("reference"),
-        gateway_response=response.text
+    await run_in_threadpool(
+        _store_payment, db, order_id, reference, payment_data.amount, data, raw_response
     )
-    
-    db.add(payment)
-    db.commit()
-    
+
     return PaymentResponse(
         authorization_url=data["authorization_url"],
         access_code=data["access_code"],
         reference=reference
     )
 
-def verify_paystack_payment(db: Session, reference: str) -> dict:
-    """Verify payment with Paystack"""
-    if not settings.PAYSTACK_SECRET_KEY:
-        raise Exception("Paystack secret key not configured")
-    
-    # Get payment record
+def _get_payment(db: Session, reference: str) -> Payment:
+    """Get a payment record by our reference"""
     payment = db.query(Payment).filter(Payment.reference == reference).first()
     if not payment:
         raise Exception("Payment record not found")
-    
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
+    return payment
+
+def _payment_result(payment: Payment, data: Optional[dict] = None) -> dict:
+    """Verification response for a payment, from the stored gateway response by default"""
+    if data is None:
+        try:
+            data = json.loads(payment.gateway_response or "{}").get("data", {})
+        except ValueError:
+            data = {}
+    return {
+        "status": payment.status,
+        "amount": payment.amount,
+        "reference": payment.reference,
+        "gateway_response": data
     }
-    
-    # Verify with Paystack
-    response = requests.get(
-        f"https://api.paystack.co/transaction/verify/{payment.paystack_reference}",
-        headers=headers
-    )
-    
-    if response.status_code != 200:
-        raise Exception(f"Paystack API error: {response.text}")
-    
-    paystack_response = response.json()
-    
-    if not paystack_response.get("status"):
-        raise Exception(f"Paystack error: {paystack_response.get('message')}")
-    
-    data = paystack_response["data"]
-    
-    # Update payment status
-    if data["status"] == "success":
+
+def apply_verification(
+    db: Session,
+    reference: str,
+    data: dict,
+    raw_response: str,
+    commit: bool = True
+) -> dict:
+    """Apply a Paystack transaction status to the payment and its order
+
+    Shared by explicit verification and webhooks. The payment row is
+    locked and final payments are left untouched, so concurrent or repeated
+    deliveries of the same result apply it once. With commit=False the
+    changes are only flushed, for callers that own the transaction.
+    """
+    payment = db.query(Payment).filter(Payment.reference == reference).with_for_update().first()
+    if not payment:
+        raise Exception("Payment record not found")
+    if payment.status in FINAL_PAYMENT_STATUSES:
+        if commit:
+            db.commit()  # Release the row lock
+        return _payment_result(payment)
+
+    new_status = PAYSTACK_STATUSES.get(data.get("status"), PaymentStatus.PENDING)
+    payment.gateway_response = raw_response
+    if new_status == PaymentStatus.SUCCESS:
+        # Final payments are never updated again, so updated_at stays the
+        # payment time; the sales aggregates date the order by it
+        paid_at = datetime.now(timezone.utc)
         payment.status = PaymentStatus.SUCCESS
-        payment.gateway_response = response.text
-        
+        payment.updated_at = paid_at
+
         # Update order status
         order = db.query(Order).filter(Order.id == payment.order_id).first()
         if order:
             order.payment_status = PaymentStatus.SUCCESS
-            order.payment_reference = reference
-    else:
+            order.payment_reference = payment.reference
+        convert_reservations(db, payment.order_id)
+        record_order_sales(db, payment.order_id, paid_at.date())
+    elif new_status == PaymentStatus.FAILED:
         payment.status = PaymentStatus.FAILED
-        payment.gateway_response = response.text
-    
-    db.commit()
-    
-    return {
-        "status": payment.status,
-        "amount": payment.amount,
-        "reference": payment.reference,
-        "gateway_response": data
-    }
+        # Let the sweeper put the order's stock back now rather than at expiry
+        expire_reservations(db, payment.order_id)
+
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+    return _payment_result(payment, data)
+
+async def _verify_with_gateway(reference: str) -> dict:
+    """Ask Paystack for a payment's status and record it, in a dedicated session"""
+    db = SessionLocal()
+    try:
+        payment = await run_in_threadpool(_get_payment, db, reference)
+        if payment.status in FINAL_PAYMENT_STATUSES:
+            return _payment_result(payment)
+        data, raw_response = await paystack_client.verify_transaction(payment.paystack_reference)
+        return await run_in_threadpool(apply_verification, db, reference, data, raw_response)
+    finally:
+        db.close()
+
+async def verify_paystack_payment(db: Session, reference: str) -> dict:
+    """Verify payment with Paystack"""
+    if not settings.PAYSTACK_SECRET_KEY:
+        raise Exception("Paystack secret key not configured")
+
+    # Final payments never change; answer from the database
+    payment = await run_in_threadpool(_get_payment, db, reference)
+    if payment.status in FINAL_PAYMENT_STATUSES:
+        return _payment_result(payment)
+
+    # Single flight: concurrent verifies of a reference in this worker share
+    # one gateway call. Its own session lets it outlive a cancelled caller.
+    verification = _verifications_in_flight.get(reference)
+    if verification is None:
+        verification = asyncio.ensure_future(_verify_with_gateway(reference))
+        _verifications_in_flight[reference] = verification
+        verification.add_done_callback(lambda _: _verifications_in_flight.pop(reference, None))
+    return await asyncio.shield(verification)
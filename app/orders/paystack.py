@@ -0,0 +1,171 @@
+# Orders module - pooled, non-blocking Paystack API client
+import asyncio
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Tuple
+from app.config import settings
+from app.metrics import observe_paystack
+
+if TYPE_CHECKING:
+    import httpx
+
+class PaystackError(Exception):
+    """Paystack rejected a request or returned an unusable response"""
+
+class PaystackUnavailable(PaystackError):
+    """Paystack is unreachable, or the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Stops calling a failing dependency until a cool-down has passed
+
+    Opens after failure_threshold consecutive failures. Once reset_timeout
+    has elapsed a single trial call is let through (half-open); its outcome
+    closes the breaker again or restarts the cool-down.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a call allowed by allow() that ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+# Worth retrying an idempotent call on these
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class PaystackClient:
+    """Async Paystack client sharing one keep-alive connection pool"""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.PAYSTACK_BREAKER_THRESHOLD,
+            reset_timeout=settings.PAYSTACK_BREAKER_RESET_SECONDS
+        )
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        """Create the pooled HTTP client on first use"""
+        if self._client is None:
+            # Imported here: httpx is a large import only payment calls need
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=settings.PAYSTACK_BASE_URL,
+                headers={
+                    "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
+                    "Content-Type": "application/json"
+                },
+                timeout=httpx.Timeout(
+                    settings.PAYSTACK_TIMEOUT_SECONDS,
+                    connect=settings.PAYSTACK_CONNECT_TIMEOUT_SECONDS
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.PAYSTACK_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.PAYSTACK_MAX_CONNECTIONS
+                ),
+                http2=settings.PAYSTACK_HTTP2  # Needs the optional h2 package
+            )
+        return self._client
+
+    async def _send(self, operation: str, method: str, path: str, **kwargs) -> "httpx.Response":
+        """Send one request through the circuit breaker"""
+        import httpx
+        if not self.breaker.allow():
+            observe_paystack(operation, "breaker_open", 0.0)
+            raise PaystackUnavailable("Paystack circuit breaker is open")
+        started = time.perf_counter()
+        try:
+            response = await self._get_client().request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            observe_paystack(operation, "error", time.perf_counter() - started)
+            self.breaker.record_failure()
+            raise PaystackUnavailable(f"Paystack request failed: {e!r}")
+        except BaseException:
+            # Cancelled, or failed before Paystack could answer: without this
+            # a half-open breaker would wait for the trial's outcome forever
+            self.breaker.release()
+            raise
+        observe_paystack(operation, str(response.status_code), time.perf_counter() - started)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    @staticmethod
+    def _parse(response: "httpx.Response") -> Tuple[dict, str]:
+        """Unwrap a Paystack envelope into (data, raw body)"""
+        if response.status_code != 200:
+            raise PaystackError(f"Paystack API error: {response.text}")
+        paystack_response = response.json()
+        if not paystack_response.get("status"):
+            raise PaystackError(f"Paystack error: {paystack_response.get('message')}")
+        return paystack_response["data"], response.text
+
+    async def initialize_transaction(self, payload: dict) -> Tuple[dict, str]:
+        """Start a transaction (not retried: a retry could create a second one)"""
+        response = await self._send("initialize", "POST", "/transaction/initialize", json=payload)
+        return self._parse(response)
+
+    async def verify_transaction(self, reference: str) -> Tuple[dict, str]:
+        """Look up a transaction, retrying transient failures with jittered backoff"""
+        attempts = settings.PAYSTACK_VERIFY_RETRIES + 1
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = await self._send("verify", "GET", f"/transaction/verify/{reference}")
+            except PaystackUnavailable:
+                if last_attempt or self.breaker.state == "open":
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                    return self._parse(response)
+            # Full jitter: sleep a random time up to the exponential backoff cap
+            await asyncio.sleep(random.uniform(0, settings.PAYSTACK_RETRY_BACKOFF_SECONDS * 2 ** attempt))
+        raise PaystackUnavailable("Paystack verification retries exhausted")
+
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+paystack_client = PaystackClient()
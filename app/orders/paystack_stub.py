@@ -0,0 +1,110 @@
+"""
+Local stand-in for the Paystack transaction API, for tests and benchmarks.
+
+Run it next to the app and point the client at it:
+
+    uvicorn app.orders.paystack_stub:app --port 8001
+    PAYSTACK_BASE_URL=http://localhost:8001 PAYSTACK_SECRET_KEY=sk_test_stub ...
+
+Environment knobs:
+    PAYSTACK_STUB_LATENCY_MS   artificial delay added to every call (default 0)
+    PAYSTACK_STUB_OUTCOME      status reported by verify (default "success")
+    PAYSTACK_STUB_WEBHOOK_URL  where to POST signed charge events when an outcome
+                               is forced (e.g. http://localhost:8000/orders/payment/webhook)
+    PAYSTACK_STUB_SECRET_KEY   key the events are signed with (match PAYSTACK_SECRET_KEY)
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import uuid
+from typing import Dict
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Paystack stub")
+
+# reference -> transaction
+transactions: Dict[str, dict] = {}
+
+async def _simulate_latency() -> None:
+    latency_ms = float(os.getenv("PAYSTACK_STUB_LATENCY_MS", "0"))
+    if latency_ms:
+        await asyncio.sleep(latency_ms / 1000)
+
+@app.post("/transaction/initialize")
+async def initialize(request: Request):
+    """Mimic POST /transaction/initialize"""
+    await _simulate_latency()
+    payload = await request.json()
+    reference = payload.get("reference") or uuid.uuid4().hex
+    access_code = uuid.uuid4().hex[:15]
+    transactions[reference] = {
+        "reference": reference,
+        "amount": payload.get("amount"),
+        "email": payload.get("email"),
+        "metadata": payload.get("metadata"),
+        "status": os.getenv("PAYSTACK_STUB_OUTCOME", "success"),
+    }
+    return {
+        "status": True,
+        "message": "Authorization URL created",
+        "data": {
+            "authorization_url": f"{request.base_url}checkout/{access_code}",
+            "access_code": access_code,
+            "reference": reference,
+        },
+    }
+
+def _transaction_data(reference: str, transaction: dict) -> dict:
+    return {
+        "id": abs(hash(reference)) % 10 ** 9,
+        "domain": "test",
+        "gateway_response": "Successful",
+        "currency": "NGN",
+        "channel": "card",
+        **transaction,
+    }
+
+@app.get("/transaction/verify/{reference}")
+async def verify(reference: str):
+    """Mimic GET /transaction/verify/:reference"""
+    await _simulate_latency()
+    transaction = transactions.get(reference)
+    if transaction is None:
+        return JSONResponse(
+            status_code=400,
+            content={"status": False, "message": "Transaction reference not found"},
+        )
+    return {
+        "status": True,
+        "message": "Verification successful",
+        "data": _transaction_data(reference, transaction),
+    }
+
+async def _send_webhook(reference: str, transaction: dict) -> None:
+    """POST a signed charge event, as Paystack does when a charge settles"""
+    url = os.getenv("PAYSTACK_STUB_WEBHOOK_URL")
+    if not url or transaction["status"] not in ("success", "failed"):
+        return
+    body = json.dumps({
+        "event": f"charge.{transaction['status']}",
+        "data": _transaction_data(reference, transaction),
+    }).encode()
+    secret = os.getenv("PAYSTACK_STUB_SECRET_KEY", "sk_test_stub")
+    signature = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+    async with httpx.AsyncClient() as client:
+        await client.post(url, content=body, headers={
+            "Content-Type": "application/json",
+            "x-paystack-signature": signature,
+        })
+
+@app.put("/_stub/transactions/{reference}")
+async def set_outcome(reference: str, status: str = "success"):
+    """Force the status verify will report for a transaction, and send its webhook"""
+    transaction = transactions.setdefault(reference, {"reference": reference, "amount": 0})
+    transaction["status"] = status
+    await _send_webhook(reference, transaction)
+    return transaction
@@ -0,0 +1,146 @@
+# Orders module - stock reservations
+#
+# Stock is taken off the shelf when an order is placed and recorded as a
+# hold that expires after RESERVATION_TTL_MINUTES. A successful payment
+# converts the hold into a sale; the sweeper puts expired holds (including
+# those expired early by a failed payment) back on the shelf. Every state
+# change is a conditional UPDATE on status = 'held', so a hold is converted
+# or released exactly once even when the sweeper races a payment.
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Order, OrderStatus, PaymentStatus, ReservationStatus, StockReservation
+from app.books.crud import adjust_books_stock
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _totals(rows: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """Sum (book_id, quantity) rows per book"""
+    totals: Dict[int, int] = {}
+    for book_id, quantity in rows:
+        totals[book_id] = totals.get(book_id, 0) + quantity
+    return totals
+
+def hold_stock(order: Order, quantities: Dict[int, int]) -> None:
+    """Attach holds for stock already taken for a new order (no commit)"""
+    expires_at = _now() + timedelta(minutes=settings.RESERVATION_TTL_MINUTES)
+    order.reservations = [
+        StockReservation(book_id=book_id, quantity=quantity, expires_at=expires_at)
+        for book_id, quantity in quantities.items()
+    ]
+
+def convert_reservations(db: Session, order_id: int) -> None:
+    """Turn an order's holds into a sale once it is paid (no commit)
+
+    If the sweeper already released the holds (payment confirmed after
+    expiry), the stock is taken again; any shortfall is logged for manual
+    fulfilment since the customer has paid.
+    """
+    db.execute(
+        update(StockReservation)
+        .where(StockReservation.order_id == order_id, StockReservation.status == ReservationStatus.HELD)
+        .values(status=ReservationStatus.CONVERTED, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    reclaimed = db.execute(
+        update(StockReservation)
+        .where(StockReservation.order_id == order_id, StockReservation.status == ReservationStatus.RELEASED)
+        .values(status=ReservationStatus.CONVERTED, updated_at=func.now())
+        .returning(StockReservation.book_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not reclaimed:
+        return
+
+    quantities = _totals(reclaimed)
+    adjust_books_stock(db, {book_id: -quantity for book_id, quantity in quantities.items()})
+    db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == OrderStatus.CANCELLED)
+        .values(status=OrderStatus.PENDING, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    print(f"Order {order_id} was paid after its stock hold expired; re-reserved {quantities}, check availability")
+
+def expire_reservations(db: Session, order_id: int) -> None:
+    """Mark an order's holds as due for release, e.g. after a failed payment (no commit)"""
+    db.execute(
+        update(StockReservation)
+        .where(StockReservation.order_id == order_id, StockReservation.status == ReservationStatus.HELD)
+        .values(expires_at=_now())
+        .execution_options(synchronize_session=False)
+    )
+
+def release_expired_reservations(db: Session, limit: int = 500) -> int:
+    """Return up to limit expired holds to stock in one transaction
+
+    Orders left with no live hold and no successful payment are cancelled.
+    Returns the number of holds released.
+    """
+    candidates = db.query(StockReservation.id).filter(
+        StockReservation.status == ReservationStatus.HELD,
+        StockReservation.expires_at <= _now()
+    ).order_by(StockReservation.expires_at).limit(limit).with_for_update(skip_locked=True).all()
+    if not candidates:
+        db.rollback()
+        return 0
+
+    # Only rows still held at UPDATE time come back, so stock is restored once
+    released: List[Tuple[int, int, int]] = db.execute(
+        update(StockReservation)
+        .where(
+            StockReservation.id.in_([row.id for row in candidates]),
+            StockReservation.status == ReservationStatus.HELD
+        )
+        .values(status=ReservationStatus.RELEASED, updated_at=func.now())
+        .returning(StockReservation.order_id, StockReservation.book_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    adjust_books_stock(db, _totals((book_id, quantity) for _, book_id, quantity in released))
+
+    order_ids = {order_id for order_id, _, _ in released}
+    still_held = select(StockReservation.order_id).where(
+        StockReservation.order_id.in_(order_ids),
+        StockReservation.status == ReservationStatus.HELD
+    )
+    db.execute(
+        update(Order)
+        .where(
+            Order.id.in_(order_ids),
+            Order.id.not_in(still_held),
+            Order.status == OrderStatus.PENDING,
+            Order.payment_status != PaymentStatus.SUCCESS
+        )
+        .values(status=OrderStatus.CANCELLED, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(released)
+
+def sweep_reservations() -> int:
+    """Release every expired hold, batch by batch"""
+    db = SessionLocal()
+    try:
+        total = 0
+        while True:
+            released = release_expired_reservations(db, settings.RESERVATION_SWEEP_BATCH_SIZE)
+            total += released
+            if released < settings.RESERVATION_SWEEP_BATCH_SIZE:
+                return total
+    finally:
+        db.close()
+
+async def run_reservation_sweeper() -> None:
+    """Background task: sweep expired holds every RESERVATION_SWEEP_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await run_in_threadpool(sweep_reservations)
+        except Exception as e:
+            print(f"Reservation sweep failed: {e}")
+        await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
@@ -1,76 +1,96 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User, Order, OrderItem, OrderStatus, PaymentStatus
-from app.schemas import OrderCreate, Order as OrderSchema, PaymentInitiate, PaymentResponse
-from app.books.crud import check_book_stock, update_book_stock, get_book
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request
+from fastapi.responses import RedirectResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
+from app.database import get_db, get_read_db
+from app.models import Order, OrderItem, OrderStatus, PaymentStatus
+from app.schemas import OrderCreate, Order as OrderSchema, OrderPage, PaymentInitiate, PaymentResponse
+from app.pagination import encode_cursor, decode_cursor
+from app.books.crud import get_books_for_update, take_books_stock
+from app.orders.reservations import hold_stock
+from app.orders.idempotency import IDEMPOTENCY_KEY_HEADER, run_idempotent
+from app.orders.webhooks import SIGNATURE_HEADER, verify_signature, store_event, notify_workers
 from app.orders.payments import initiate_paystack_payment, verify_paystack_payment
-from app.auth.utils import get_current_active_user
+from app.orders.paystack import PaystackUnavailable
+from app.auth.utils import get_current_active_user, UserPrincipal
 import uuid
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# OrderSchema nests items and their books; load both up front so serializing
+# any number of orders costs two extra queries instead of one per row
+order_eager_load = selectinload(Order.order_items).selectinload(OrderItem.book)
+
 def create_order(db: Session, order: OrderCreate, user_id: int) -> Order:
     """Create a new order"""
-    total_amount = 0.0
-    order_items = []
-    
-    # Validate and calculate total
+    # Total quantity per book, in case a book appears on several lines
+    quantities = {}
     for item in order.order_items:
-        book = get_book(db, item.book_id)
+        if item.quantity < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid quantity for book with ID {item.book_id}"
+            )
+        quantities[item.book_id] = quantities.get(item.book_id, 0) + item.quantity
+    
+    # Lock every requested book in one query, then validate in memory
+    books = get_books_for_update(db, quantities.keys())
+    for book_id, quantity in quantities.items():
+        book = books.get(book_id)
         if not book or not book.is_active:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Book with ID {item.book_id} not found"
+                detail=f"Book with ID {book_id} not found"
             )
         
-        if not check_book_stock(db, item.book_id, item.quantity):
+        if book.stock_quantity < quantity:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Insufficient stock for book: {book.title}"
             )
-        
-        item_total = book.price * item.quantity
-        total_amount += item_total
-        
-        order_items.append({
-            "book_id": item.book_id,
-            "quantity": item.quantity,
-            "price": book.price
-        })
     
-    # Create order
+    total_amount = sum(books[item.book_id].price * item.quantity for item in order.order_items)
+    
+    # Create order with its items
     db_order = Order(
         user_id=user_id,
         total_amount=total_amount,
-        payment_reference=f"ORD_{uuid.uuid4().hex[:10].upper()}"
+        payment_reference=f"ORD_{uuid.uuid4().hex[:10].upper()}",
+        order_items=[
+            OrderItem(
+                book_id=item.book_id,
+                quantity=item.quantity,
+                price=books[item.book_id].price
+            )
+            for item in order.order_items
+        ]
     )
     
-    db.add(db_order)
-    db.flush()  # Get the order ID
-    
-    # Create order items and update stock
-    for item_data in order_items:
-        order_item = OrderItem(
-            order_id=db_order.id,
-            **item_data
+    # Update stock for all books at once; the stock guard in the UPDATE also
+    # covers databases where the row locks above are a no-op
+    if not take_books_stock(db, quantities):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient stock for one or more books"
         )
-        db.add(order_item)
-        
-        # Update book stock
-        update_book_stock(db, item_data["book_id"], -item_data["quantity"])
     
+    # Held until paid; the sweeper restocks it if payment never arrives
+    hold_stock(db_order, quantities)
+    
+    db.add(db_order)
+    db.flush()  # Get the order ID
+    order_id = db_order.id
     db.commit()
-    db.refresh(db_order)
     
-    return db_order
+    return db.query(Order).options(order_eager_load).filter(Order.id == order_id).one()
 
 @router.post("/", response_model=OrderSchema)
 def create_new_order(
     order: OrderCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ):
     """Create a new order"""
     if not order.order_items:
@@ -81,15 +101,33 @@ def create_new_order(
     
     return create_order(db=db, order=order, user_id=current_user.id)
 
-@router.get("/", response_model=List[OrderSchema])
+@router.get("/", response_model=Union[List[OrderSchema], OrderPage])
 def read_user_orders(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(
+        None, description="Keyset cursor; pass an empty value for the first page"
+    ),
+    db: Session = Depends(get_read_db),
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ):
     """Get user's orders"""
-    orders = db.query(Order).filter(
+    if cursor is not None:
+        # Newest first, walking (user_id, id) backwards
+        before_id = decode_cursor(cursor).get("id")
+        query = db.query(Order).options(order_eager_load).filter(
+            Order.user_id == current_user.id
+        )
+        if before_id is not None:
+            query = query.filter(Order.id < before_id)
+        orders = query.order_by(Order.id.desc()).limit(limit + 1).all()
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor({"id": orders[-1].id})
+        return {"items": orders, "next_cursor": next_cursor}
+    
+    orders = db.query(Order).options(order_eager_load).filter(
         Order.user_id == current_user.id
     ).offset(skip).limit(limit).all()
     
@@ -99,10 +137,10 @@ def read_user_orders(
 def read_order(
     order_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user)
 ):
     """Get a specific order"""
-    order = db.query(Order).filter(
+    order = db.query(Order).options(order_eager_load).filter(
         Order.id == order_id,
         Order.user_id == current_user.id
     ).first()
@@ -115,18 +153,23 @@ def read_order(
     
     return order
 
+def get_user_order(db: Session, order_id: int, user_id: int) -> Optional[Order]:
+    """Get an order if it belongs to the user"""
+    return db.query(Order).filter(
+        Order.id == order_id,
+        Order.user_id == user_id
+    ).first()
+
 @router.post("/payment/initiate", response_model=PaymentResponse)
-def initiate_payment(
+async def initiate_payment(
     payment_data: PaymentInitiate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER, max_length=255)
 ):
     """Initiate payment for an order"""
     # Verify order belongs to user
-    order = db.query(Order).filter(
-        Order.id == payment_data.order_id,
-        Order.user_id == current_user.id
-    ).first()
+    order = await run_in_threadpool(get_user_order, db, payment_data.order_id, current_user.id)
     
     if not order:
         raise HTTPException(
@@ -140,14 +183,33 @@ def initiate_payment(
             detail="Order already paid"
         )
     
+    if order.status == OrderStatus.CANCELLED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order has expired, please place it again"
+        )
+    
     if payment_data.amount != order.total_amount:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Payment amount doesn't match order total"
         )
     
+    # Claiming the idempotency key commits, which expires the order
+    order_id, user_id = order.id, order.user_id
     try:
-        return initiate_paystack_payment(db, payment_data, order)
+        # A retried request with the same key gets the same transaction back
+        return await run_idempotent(
+            db, f"initiate:{current_user.id}", idempotency_key, payment_data.model_dump_json(),
+            lambda: initiate_paystack_payment(db, payment_data, order_id, user_id)
+        )
+    except PaystackUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Payment gateway unavailable: {str(e)}"
+        )
+    except (HTTPException, PoolTimeout):
+        raise  # Idempotency conflicts, and pool timeouts answered with 503 app-wide
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -155,22 +217,57 @@ def initiate_payment(
         )
 
 @router.post("/payment/verify")
-def verify_payment(
+async def verify_payment(
     reference: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER, max_length=255)
 ):
     """Verify payment (callback from Paystack)"""
     try:
-        result = verify_paystack_payment(db, reference)
+        result = await run_idempotent(
+            db, "verify", idempotency_key, reference,
+            lambda: verify_paystack_payment(db, reference)
+        )
         return result
+    except PaystackUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Payment gateway unavailable: {str(e)}"
+        )
+    except (HTTPException, PoolTimeout):
+        raise  # Idempotency conflicts, and pool timeouts answered with 503 app-wide
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Payment verification failed: {str(e)}"
         )
 
+@router.post("/payment/webhook")
+async def payment_webhook(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """Paystack webhook: store the signed event and acknowledge it immediately"""
+    body = await request.body()
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER)):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
+        )
+    
+    try:
+        stored = await run_in_threadpool(store_event, db, body)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook payload"
+        )
+    if stored:
+        notify_workers()
+    return {"status": "accepted" if stored else "duplicate"}
+
 @router.get("/payment/callback")
-def payment_callback(
+async def payment_callback(
     trxref: str,
     reference: str,
     db: Session = Depends(get_db)
@@ -178,11 +275,9 @@ def payment_callback(
     """Payment callback from Paystack"""
     try:
         # Verify the payment using the reference
-        result = verify_paystack_payment(db, reference)
+        result = await verify_paystack_payment(db, reference)
         
         # Redirect to success page or return success response
-        from fastapi.responses import RedirectResponse
-        
         if result.get("status") == "success":
             # Extract order_id from payment data if available
             order_id = result.get("order_id", 1)  # Default to 1 if not found
@@ -0,0 +1,171 @@
+# Orders module - Paystack webhook inbox
+#
+# The webhook endpoint only checks the signature and stores the event, so
+# Paystack gets its 200 immediately and bursts cost one INSERT each.
+# Background workers claim stored events in batches and apply each batch in
+# one transaction (a savepoint per event), with the same apply_verification
+# used by explicit verification; the signed event carries the transaction
+# status, so no call back to Paystack is needed.
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal
+from app.models import PaystackEvent, WebhookEventStatus
+from app.orders.payments import apply_verification
+
+SIGNATURE_HEADER = "x-paystack-signature"
+# Events that settle a transaction; others are stored and marked processed
+CHARGE_EVENTS = ("charge.success", "charge.failed")
+# How long a claimed event stays invisible to other workers
+CLAIM_LEASE_SECONDS = 60
+
+_wakeup: Optional[asyncio.Event] = None
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Check the HMAC-SHA512 of the raw body against x-paystack-signature"""
+    if not signature or not settings.PAYSTACK_SECRET_KEY:
+        return False
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def store_event(db: Session, body: bytes) -> bool:
+    """Persist a verified webhook; returns False for a redelivered event
+
+    Raises ValueError for a body that is not a JSON object with an object
+    (or missing) "data".
+    """
+    payload = json.loads(body)
+    if not isinstance(payload, dict):
+        raise ValueError("Webhook payload must be a JSON object")
+    event_type = payload.get("event") or ""
+    data = payload.get("data") or {}
+    if not isinstance(event_type, str) or not isinstance(data, dict):
+        raise ValueError("Webhook payload has an invalid event or data")
+    reference = data.get("reference")
+    db.add(PaystackEvent(
+        event_key=f"{event_type}:{data.get('id') or reference or hashlib.sha256(body).hexdigest()}",
+        event_type=event_type,
+        reference=reference,
+        payload=body.decode(),
+        available_at=_now()
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+def notify_workers() -> None:
+    """Wake idle workers in this process after storing an event"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+def claim_events(db: Session, limit: int) -> List[PaystackEvent]:
+    """Lease up to limit due events to this worker
+
+    Candidates are locked with SKIP LOCKED on PostgreSQL so workers pick
+    disjoint batches; the conditional UPDATE ... RETURNING keeps claims
+    exclusive on SQLite too. Leases of workers that died expire, making
+    their events due again.
+    """
+    now = _now()
+    due = (
+        PaystackEvent.status.in_([WebhookEventStatus.PENDING, WebhookEventStatus.PROCESSING]),
+        PaystackEvent.available_at <= now
+    )
+    candidates = db.query(PaystackEvent.id).filter(*due).order_by(
+        PaystackEvent.id
+    ).limit(limit).with_for_update(skip_locked=True).all()
+    if not candidates:
+        db.rollback()
+        return []
+    claimed_ids = db.execute(
+        update(PaystackEvent)
+        .where(PaystackEvent.id.in_([row.id for row in candidates]), *due)
+        .values(
+            status=WebhookEventStatus.PROCESSING,
+            attempts=PaystackEvent.attempts + 1,
+            available_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+        )
+        .returning(PaystackEvent.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    return db.query(PaystackEvent).filter(PaystackEvent.id.in_(claimed_ids)).order_by(PaystackEvent.id).all()
+
+def _process_event(db: Session, event: PaystackEvent) -> None:
+    """Apply one claimed event and mark it processed (no commit)"""
+    event.status = WebhookEventStatus.PROCESSED
+    event.processed_at = _now()
+    event.last_error = None
+    if event.event_type in CHARGE_EVENTS and event.reference:
+        data = json.loads(event.payload).get("data") or {}
+        apply_verification(db, event.reference, data, event.payload, commit=False)
+    db.flush()
+
+def _record_failure(db: Session, event_id: int, error: Exception) -> None:
+    """Schedule a retry with exponential backoff, or give up after WEBHOOK_MAX_ATTEMPTS (no commit)"""
+    event = db.get(PaystackEvent, event_id)
+    event.last_error = f"{error.__class__.__name__}: {error}"
+    if event.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+        event.status = WebhookEventStatus.FAILED
+        print(f"Giving up on Paystack event {event.event_key}: {event.last_error}")
+    else:
+        event.status = WebhookEventStatus.PENDING
+        event.available_at = _now() + timedelta(seconds=2 ** event.attempts)
+
+def process_event_batch(limit: int) -> int:
+    """Claim and apply one batch of events in one transaction; returns the batch size
+
+    Each event runs in a savepoint, so a failing event only rolls back its
+    own changes and is rescheduled in the same commit. If the commit itself
+    fails, the whole batch becomes due again when its lease expires.
+    """
+    db = SessionLocal()
+    try:
+        events = claim_events(db, limit)
+        for event in events:
+            event_id = event.id
+            try:
+                with db.begin_nested():
+                    _process_event(db, event)
+            except Exception as e:
+                _record_failure(db, event_id, e)
+        db.commit()
+        return len(events)
+    finally:
+        db.close()
+
+async def run_webhook_worker() -> None:
+    """Background task: drain due events, then sleep until notified or polled"""
+    while True:
+        try:
+            claimed = await run_in_threadpool(process_event_batch, settings.WEBHOOK_BATCH_SIZE)
+        except Exception as e:
+            print(f"Webhook worker failed: {e}")
+            claimed = 0
+        if claimed:
+            continue
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), settings.WEBHOOK_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+def start_webhook_workers() -> List[asyncio.Task]:
+    """Start WEBHOOK_WORKERS workers on the running event loop"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    return [asyncio.create_task(run_webhook_worker()) for _ in range(settings.WEBHOOK_WORKERS)]
@@ -0,0 +1,67 @@
+# Server-rendered pages - catalogue and product fragments
+#
+# The catalogue and product pages embed their books, so first paint needs
+# no API round trip. Rendered fragments are cached per worker under the
+# catalogue version, which every book write changes: a stale fragment is
+# never looked up again and simply ages out of the LRU.
+import orjson
+from markupsafe import Markup
+from sqlalchemy.orm import Session
+from app.cache import TTLCache
+from app.config import settings
+from app.database import primary_session
+from app.books.cache import get_catalogue_version
+from app.books.crud import get_book_rows
+from app.books.recommendations import (
+    get_recommendation_index, popular_book_ids, recommended_books, related_book_ids
+)
+from app.templating import get_templates
+
+# Books embedded in the catalogue page; the client-side search runs over them
+CATALOGUE_BOOKS = 100
+# Of which rendered as cards on first paint
+CATALOGUE_FIRST_PAGE = 12
+RELATED_BOOKS = 4
+
+fragment_cache = TTLCache(maxsize=settings.PAGE_CACHE_MAX_SIZE, ttl=settings.PAGE_CACHE_TTL_SECONDS)
+
+def embed_json(data) -> Markup:
+    """JSON that is safe inside a <script type="application/json"> element"""
+    raw = orjson.dumps(data, option=orjson.OPT_UTC_Z).decode("utf-8")
+    return Markup(raw.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026"))
+
+def render_fragment(key: tuple, template_name: str, build_context) -> Markup:
+    """Render a fragment template, or reuse the cached rendering for key"""
+    html = fragment_cache.get(key)
+    if html is None:
+        html = get_templates().get_template(template_name).render(**build_context())
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+def catalogue_fragment(db: Session) -> Markup:
+    """Books grid and embedded catalogue data for the home page"""
+    version = get_catalogue_version(db)["etag"]
+
+    def build_context() -> dict:
+        # Cached under the primary's catalogue version, so read from the primary too
+        with primary_session(db) as primary:
+            books = get_book_rows(primary, limit=CATALOGUE_BOOKS)
+        return {"books": books, "first_page": CATALOGUE_FIRST_PAGE, "books_json": embed_json(books)}
+
+    return render_fragment(("catalogue", version), "_catalogue.html", build_context)
+
+def book_fragment(db: Session, book: dict) -> Markup:
+    """Product details and related books for one (serialized) book"""
+    index = get_recommendation_index()
+    # Related books are other catalogue rows, so any book write or index
+    # rebuild makes a new key
+    key = (
+        "book", book["id"], get_catalogue_version(db)["etag"],
+        index.built_at if index is not None else None
+    )
+
+    def build_context() -> dict:
+        candidates = related_book_ids(book["id"], RELATED_BOOKS * 2) + popular_book_ids(RELATED_BOOKS * 2)
+        return {"book": book, "related": recommended_books(db, candidates, RELATED_BOOKS, exclude=book["id"])}
+
+    return render_fragment(key, "_book_detail.html", build_context)
@@ -0,0 +1,25 @@
+import base64
+import json
+from typing import Any, Dict, Optional
+from fastapi import HTTPException, status
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode keyset values as an opaque, URL-safe cursor"""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor ("" means the first page)"""
+    if not cursor:
+        return {}
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, dict) or not isinstance(values.get("id"), int):
+            raise ValueError("cursor must carry an integer id")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return values
@@ -0,0 +1,106 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, List, Optional, Tuple
+from app.config import settings
+
+# Leaf frames in these files are idle threads (parked workers, the event
+# loop's selector), not work worth charging to a request.
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+class SamplingProfiler:
+    """Low-overhead wall-clock sampler for slow requests
+
+    A daemon thread snapshots every thread's stack each interval while any
+    request is in flight. When a request finishes slower than threshold_ms,
+    the samples taken during it are written to output_dir in collapsed-stack
+    format ("frame;frame;frame count"), ready for flamegraph.pl or
+    speedscope. Samples are process-wide, so stacks from concurrent
+    requests are included as well.
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float = 5.0,
+                 output_dir: str = "profiles", window_seconds: float = 60.0):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._samples: Deque[Tuple[float, List[str]]] = deque(maxlen=int(window_seconds / self.interval))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def request_started(self) -> float:
+        with self._lock:
+            self._in_flight += 1
+            self._ensure_started()
+        self._wake.set()
+        return time.monotonic()
+
+    def request_finished(self, started: float, label: str, elapsed: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._wake.clear()
+        if elapsed >= self.threshold:
+            self._dump(started, time.monotonic(), label, elapsed)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self._wake.wait()
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _collapse(frame)
+                if stack:
+                    stacks.append(stack)
+            self._samples.append((time.monotonic(), stacks))
+            time.sleep(self.interval)
+
+    def _dump(self, started: float, finished: float, label: str, elapsed: float) -> None:
+        counts: Counter = Counter()
+        for taken_at, stacks in list(self._samples):
+            if started <= taken_at <= finished:
+                counts.update(stacks)
+        if not counts:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^\w]+", "_", label).strip("_")
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{elapsed * 1000:.0f}ms.folded")
+        try:
+            with open(path, "w") as f:
+                for stack, count in counts.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Could not write profile {path}: {e}")
+
+def _collapse(frame) -> Optional[str]:
+    """Render a stack root-first as "file:function;..." or None when idle"""
+    if frame.f_code.co_filename.endswith(IDLE_FILES):
+        return None
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+def get_profiler() -> Optional[SamplingProfiler]:
+    """The slow-request profiler, or None unless PROFILE_SLOW_REQUEST_MS is set"""
+    if settings.PROFILE_SLOW_REQUEST_MS <= 0:
+        return None
+    return SamplingProfiler(
+        threshold_ms=settings.PROFILE_SLOW_REQUEST_MS,
+        interval_ms=settings.PROFILE_SAMPLE_INTERVAL_MS,
+        output_dir=settings.PROFILE_DIR
+    )
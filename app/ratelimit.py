@@ -0,0 +1,253 @@
+# Rate limiting and admission control
+#
+# Every client (JWT subject when a valid bearer token is sent, otherwise the
+# client IP) has one token bucket; each request takes its route's cost from
+# it, so a login (bcrypt) drains the bucket faster than a book lookup.
+# Expensive routes also have a per-worker cap on requests in flight: past
+# it, requests are shed with 503 at once instead of queueing behind the
+# bcrypt pool, the database or Paystack and dragging every latency up.
+import logging
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from jose import JWTError, jwt
+from app.cache import FakeRedis, TTLCache, get_async_shared_client
+from app.config import settings
+from app.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RouteLimit:
+    """Cost and concurrency cap for requests matching method and path"""
+    method: str
+    path: str  # Regular expression matched against the whole path
+    cost: float = 1.0
+    max_concurrent: int = 0  # 0 = uncapped
+    query_param: Optional[str] = None  # Only when this query parameter is present
+    name: str = ""
+
+ROUTE_LIMITS = (
+    RouteLimit("POST", r"/auth/login", cost=5, max_concurrent=settings.CONCURRENCY_LIMIT_LOGIN, name="login"),
+    RouteLimit("POST", r"/auth/signup", cost=5, max_concurrent=settings.CONCURRENCY_LIMIT_LOGIN, name="login"),
+    RouteLimit("POST", r"/orders/payment/verify", cost=3, max_concurrent=settings.CONCURRENCY_LIMIT_PAYMENT, name="payment"),
+    RouteLimit("POST", r"/orders/payment/initiate", cost=3, max_concurrent=settings.CONCURRENCY_LIMIT_PAYMENT, name="payment"),
+    RouteLimit("POST", r"/orders/", cost=2),
+    RouteLimit("GET", r"/books/?", cost=3, max_concurrent=settings.CONCURRENCY_LIMIT_SEARCH, query_param="search", name="search"),
+    RouteLimit("GET", r"/books/(stream|export)", cost=5, max_concurrent=settings.CONCURRENCY_LIMIT_SEARCH, name="search"),
+    RouteLimit("POST", r"/books/import", cost=10),
+)
+# Never limited: probes, static assets, and signed Paystack webhooks
+EXEMPT_PATHS = re.compile(r"/health|/metrics|/static/.*|/orders/payment/webhook")
+_COMPILED = [(limit, re.compile(limit.path)) for limit in ROUTE_LIMITS]
+DEFAULT_LIMIT = RouteLimit("*", r".*")
+
+def match_route(method: str, path: str, query_string: bytes) -> RouteLimit:
+    for limit, pattern in _COMPILED:
+        if limit.method != method or not pattern.fullmatch(path):
+            continue
+        if limit.query_param and not re.search(rf"(^|&){limit.query_param}=[^&]", query_string.decode("latin-1")):
+            continue
+        return limit
+    return DEFAULT_LIMIT
+
+# Backends
+
+class MemoryBucketBackend:
+    """Token buckets in this process (limits are per worker)"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        # Idle buckets are full again after burst / rate seconds and can be dropped
+        self._buckets = TTLCache(maxsize=max_keys, ttl=burst / rate + 1)
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, cost: float) -> Tuple[bool, float]:
+        """Take cost tokens; returns (allowed, seconds until they would be available)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets.set(key, (tokens, now))
+        return allowed, 0.0 if allowed else (cost - tokens) / self.rate
+
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local cost, now = tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens, stamp = burst, now
+local state = redis.call('GET', KEYS[1])
+if state then
+    local sep = string.find(state, ':', 1, true)
+    tokens = tonumber(string.sub(state, 1, sep - 1))
+    stamp = tonumber(string.sub(state, sep + 1))
+    tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+end
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('SET', KEYS[1], tokens .. ':' .. now, 'EX', math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+def _token_bucket(client, keys, args):
+    """TOKEN_BUCKET_SCRIPT for FakeRedis"""
+    rate, burst, cost, now = (float(arg) for arg in args)
+    tokens, stamp = burst, now
+    state = client.get(keys[0])
+    if state is not None:
+        tokens, stamp = (float(part) for part in state.decode("utf-8").split(":"))
+        tokens = min(burst, tokens + max(0.0, now - stamp) * rate)
+    allowed = 0
+    if tokens >= cost:
+        tokens -= cost
+        allowed = 1
+    client.set(keys[0], f"{tokens}:{now}", ex=math.ceil(burst / rate) + 1)
+    return [allowed, str(tokens).encode("utf-8")]
+
+FakeRedis.scripts[TOKEN_BUCKET_SCRIPT] = _token_bucket
+
+class SharedBucketBackend:
+    """Token buckets in the shared store (CACHE_REDIS_URL), one atomic script call per request
+
+    Limits hold across workers and instances. The store is called through
+    redis.asyncio, so a slow store never blocks the event loop. After a
+    failed call requests are limited by a per-worker fallback for
+    FAILURE_COOLDOWN_SECONDS, rather than each waiting out the timeout again.
+    """
+
+    FAILURE_COOLDOWN_SECONDS = 10.0
+
+    def __init__(self, client, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._fallback = MemoryBucketBackend(rate, burst)
+        self._retry_at = 0.0
+
+    async def take(self, key: str, cost: float) -> Tuple[bool, float]:
+        if time.monotonic() < self._retry_at:
+            return await self._fallback.take(key, cost)
+        try:
+            allowed, tokens = await self._script(
+                keys=[f"ratelimit:{key}"], args=[self.rate, self.burst, cost, time.time()]
+            )
+        except Exception:
+            logger.warning(
+                "Shared rate limit store failed; using per-worker limits for %.0fs",
+                self.FAILURE_COOLDOWN_SECONDS, exc_info=True
+            )
+            self._retry_at = time.monotonic() + self.FAILURE_COOLDOWN_SECONDS
+            return await self._fallback.take(key, cost)
+        if allowed:
+            return True, 0.0
+        return False, (cost - float(tokens)) / self.rate
+
+def create_backend():
+    """Backend chosen by RATE_LIMIT_BACKEND ("memory" or "shared")"""
+    if settings.RATE_LIMIT_BACKEND == "shared":
+        client = get_async_shared_client()
+        if client is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=shared requires CACHE_REDIS_URL")
+        return SharedBucketBackend(client, settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST)
+    return MemoryBucketBackend(settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST)
+
+# Client identity
+
+# Bearer token -> subject, so the signature is checked once per token, not per request
+_token_subjects = TTLCache(maxsize=10000, ttl=300)
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def forwarded_client(forwarded: str, trusted_proxies: int) -> str:
+    """The client address in an X-Forwarded-For chain behind trusted_proxies proxies
+
+    Each proxy appends the address it received the request from, so only the
+    rightmost trusted_proxies entries are trustworthy; anything to their left
+    was sent by the client and can be forged.
+    """
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    if not hops:
+        return "unknown"
+    return hops[-min(trusted_proxies, len(hops))]
+
+def client_key(scope) -> str:
+    """"user:<sub>" for a valid bearer token, otherwise "ip:<address>"
+
+    Unverified tokens are ignored, so minting fake subjects cannot buy a
+    client fresh buckets.
+    """
+    authorization = _header(scope, b"authorization")
+    if authorization and authorization[:7].lower() == "bearer ":
+        token = authorization[7:]
+        subject = _token_subjects.get(token)
+        if subject is None:
+            try:
+                subject = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub") or ""
+            except JWTError:
+                subject = ""
+            _token_subjects.set(token, subject)
+        if subject:
+            return f"user:{subject}"
+    forwarded = _header(scope, b"x-forwarded-for") if settings.RATE_LIMIT_TRUSTED_PROXIES > 0 else None
+    if forwarded:
+        return f"ip:{forwarded_client(forwarded, settings.RATE_LIMIT_TRUSTED_PROXIES)}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+# Middleware
+
+class RateLimitMiddleware:
+    """Token-bucket rate limiting (429) and concurrency caps (503) per route"""
+
+    def __init__(self, app, backend=None):
+        self.app = app
+        self.backend = backend or create_backend()
+        # Cap name -> requests in flight in this worker
+        self.in_flight: Dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or EXEMPT_PATHS.fullmatch(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        limit = match_route(scope["method"], scope["path"], scope.get("query_string", b""))
+        allowed, retry_after = await self.backend.take(client_key(scope), limit.cost)
+        if not allowed:
+            response = ORJSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests, please slow down"},
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        if not limit.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+        # Single-threaded event loop: the check and increment cannot interleave
+        if self.in_flight.get(limit.name, 0) >= limit.max_concurrent:
+            response = ORJSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, please retry"},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        self.in_flight[limit.name] = self.in_flight.get(limit.name, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[limit.name] -= 1
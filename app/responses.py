@@ -0,0 +1,14 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson
+
+    Serializes datetimes, dates and UUIDs natively, with "Z" for UTC to match
+    Pydantic's output.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
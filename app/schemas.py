@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, validator
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 from app.models import UserRole, OrderStatus, PaymentStatus
 
 # User Schemas
@@ -37,6 +37,11 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    # Present only on tokens issued with JWT_EMBED_USER_CLAIMS
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    role: Optional[UserRole] = None
+    created_at: Optional[datetime] = None
 
 # Book Schemas
 class BookBase(BaseModel):
@@ -70,6 +75,10 @@ class Book(BookBase):
     class Config:
         from_attributes = True
 
+class BookPage(BaseModel):
+    items: List[Book]
+    next_cursor: Optional[str] = None
+
 # Order Schemas
 class OrderItemBase(BaseModel):
     book_id: int
@@ -106,6 +115,10 @@ class Order(OrderBase):
     class Config:
         from_attributes = True
 
+class OrderPage(BaseModel):
+    items: List[Order]
+    next_cursor: Optional[str] = None
+
 # Payment Schemas
 class PaymentInitiate(BaseModel):
     order_id: int
@@ -128,6 +141,19 @@ class Payment(BaseModel):
     class Config:
         from_attributes = True
 
+# Analytics Schemas
+class BestSeller(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    units: int
+    revenue: float
+
+class DailyRevenue(BaseModel):
+    day: date
+    units: int
+    revenue: float
+
 # Response Schemas
 class MessageResponse(BaseModel):
     message: str
@@ -0,0 +1,32 @@
+# Server-rendered pages - Jinja2 templates, loaded on first use (or by the
+# startup warmup) so importing the app does not pay for Jinja2
+from app.config import settings
+
+TEMPLATE_DIRECTORY = "app/templates"
+
+_templates = None
+
+def get_templates():
+    """Get the shared Jinja2Templates, creating it on first use"""
+    global _templates
+    if _templates is None:
+        import jinja2
+        from fastapi.templating import Jinja2Templates
+        env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(TEMPLATE_DIRECTORY),
+            autoescape=jinja2.select_autoescape(),
+            # Outside development templates never change under a running
+            # worker, so skip the per-render modification-time check
+            auto_reload=settings.ENVIRONMENT == "development",
+            cache_size=-1  # Keep every compiled template
+        )
+        _templates = Jinja2Templates(env=env)
+    return _templates
+
+def precompile_templates() -> int:
+    """Compile every template into the environment's cache; returns how many"""
+    env = get_templates().env
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return len(names)
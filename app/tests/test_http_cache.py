@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from starlette.requests import Request
+from app.http_cache import is_not_modified
+
+ETAG = '"abc"'
+LAST_MODIFIED = datetime(2024, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+
+def make_request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/books/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+def test_if_modified_since_gmt():
+    request = make_request(if_modified_since="Tue, 02 Jan 2024 03:04:05 GMT")
+    assert is_not_modified(request, ETAG, LAST_MODIFIED)
+
+def test_if_modified_since_minus_zero_offset_is_utc():
+    # RFC 5322 "-0000" parses to a naive datetime
+    request = make_request(if_modified_since="Tue, 02 Jan 2024 03:04:05 -0000")
+    assert is_not_modified(request, ETAG, LAST_MODIFIED)
+    request = make_request(if_modified_since="Tue, 02 Jan 2024 03:04:04 -0000")
+    assert not is_not_modified(request, ETAG, LAST_MODIFIED)
+
+def test_unparseable_if_modified_since_is_ignored():
+    request = make_request(if_modified_since="yesterday")
+    assert not is_not_modified(request, ETAG, LAST_MODIFIED)
+
+def test_if_none_match_takes_precedence():
+    request = make_request(if_none_match='"other"', if_modified_since="Tue, 02 Jan 2024 03:04:05 GMT")
+    assert not is_not_modified(request, ETAG, LAST_MODIFIED)
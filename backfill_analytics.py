@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Sales analytics backfill script for bookstore
+Rebuilds the per-book daily sales aggregates from paid orders
+
+Usage: python backfill_analytics.py [--since 2024-01-01] [--chunk-size 1000]
+"""
+
+import argparse
+import os
+import time
+from datetime import date
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild sales aggregates from order history")
+    parser.add_argument("--since", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD); defaults to all history")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Aggregate rows per batched upsert")
+    args = parser.parse_args()
+    
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL environment variable not set!")
+        return False
+    
+    from app.database import SessionLocal, engine
+    from app.models import Base
+    from app.analytics.aggregates import backfill_sales
+    
+    # Creates book_daily_sales on databases that predate it
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        report = backfill_sales(db, since=args.since, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    
+    print(f"📊 Rebuilt {report['rows']} book/day rows in {elapsed:.1f}s")
+    print(f"✅ {report['units']} units, {report['revenue']:.2f} revenue")
+    return True
+
+if __name__ == "__main__":
+    print("📈 Starting analytics backfill...")
+    if not main():
+        exit(1)
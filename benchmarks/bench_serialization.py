@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for GET /books/
+Compares the ORM + Pydantic listing path with the column-only + orjson path
+
+Usage: python benchmarks/bench_serialization.py [--rows 10000] [--limit 1000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Self-contained in-memory database unless one is provided
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Book
+from app.schemas import Book as BookSchema
+from app.books.crud import get_books, get_book_rows
+from app.responses import ORJSONResponse
+
+def seed(db, rows):
+    db.bulk_insert_mappings(Book, [
+        {
+            "title": f"Book {i}",
+            "author": f"Author {i % 500}",
+            "description": "A generated book description " * 4,
+            "price": 5 + i % 40,
+            "stock_quantity": i % 100,
+            "isbn": f"bench-{i}",
+            "image_url": "/static/images/default-book.svg",
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+
+def orm_path(db, limit):
+    """Current path: ORM objects validated through schemas.Book, then JSON"""
+    books = get_books(db, limit=limit)
+    payload = [BookSchema.model_validate(book).model_dump(mode="json") for book in books]
+    return json.dumps(payload).encode("utf-8")
+
+def fast_path(db, limit):
+    """Fast path: column tuples straight to orjson"""
+    return ORJSONResponse(get_book_rows(db, limit=limit)).body
+
+def measure(func, session_factory, limit, repeat):
+    timings = []
+    for _ in range(repeat):
+        db = session_factory()
+        started = time.perf_counter()
+        func(db, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+        db.close()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    engine = create_engine(
+        os.environ["DATABASE_URL"],
+        connect_args={"check_same_thread": False} if os.environ["DATABASE_URL"].startswith("sqlite") else {},
+        poolclass=StaticPool if os.environ["DATABASE_URL"] == "sqlite://" else None
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    if db.query(Book).count() < args.rows:
+        seed(db, args.rows)
+    db.close()
+    
+    results = {}
+    for name, func in [("orm+pydantic", orm_path), ("columns+orjson", fast_path)]:
+        func(SessionLocal(), args.limit)  # warm up
+        results[name] = measure(func, SessionLocal, args.limit, args.repeat)
+    
+    print(f"GET /books/ serialization, limit={args.limit}, {args.repeat} runs")
+    for name, timings in results.items():
+        print(
+            f"  {name:<16} median {statistics.median(timings):8.2f} ms   "
+            f"min {min(timings):8.2f} ms"
+        )
+    speedup = statistics.median(results["orm+pydantic"]) / statistics.median(results["columns+orjson"])
+    print(f"  speedup          {speedup:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for app.main
+
+Imports the app in fresh interpreters under `python -X importtime`, reports
+the median total and the slowest modules, and exits non-zero when the total
+exceeds the budget or when a module that should load lazily (on first use
+or in the lifespan warmup) was imported. Run it in CI to keep worker cold
+starts fast.
+
+Usage:
+    python benchmarks/import_budget.py --budget-ms 1200
+    python benchmarks/import_budget.py --top 30 --forbid numpy,httpx,jinja2,psycopg2
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imported only by the code paths that need them
+DEFAULT_FORBIDDEN = "numpy,httpx,jinja2,passlib,psycopg2,asyncpg,aiosqlite"
+
+PROBE = """
+import sys
+import app.main
+import app.database
+loaded = [name for name in sys.argv[1].split(",") if name and name in sys.modules]
+if app.database._engine is not None:
+    loaded.append("<database engine>")
+print(",".join(loaded))
+"""
+
+def measure(forbidden: str) -> Tuple[Dict[str, int], List[str]]:
+    """Import the app once; returns (cumulative microseconds per module, forbidden modules loaded)"""
+    env = {
+        **os.environ,
+        # Settings are read at import but only validated at startup
+        "DATABASE_URL": os.getenv("DATABASE_URL", "sqlite:///./import-budget.db"),
+        "ENVIRONMENT": os.getenv("ENVIRONMENT", "production"),
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, forbidden],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    cumulative: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(total)
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative, loaded
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the import time of app.main against a budget")
+    parser.add_argument("--budget-ms", type=float, default=1200, help="Maximum median import time of app.main")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN, help="Comma-separated modules that must not be imported")
+    args = parser.parse_args()
+
+    runs = [measure(args.forbid) for _ in range(args.repeat)]
+    totals = [cumulative["app.main"] / 1000 for cumulative, _ in runs]
+    median_ms = statistics.median(totals)
+
+    # Slowest modules (cumulative, so packages include their submodules) of the median run
+    median_run = sorted(runs, key=lambda run: run[0]["app.main"])[len(runs) // 2][0]
+    print(f"{'module':<45} {'cumulative ms':>14}")
+    for name, total in sorted(median_run.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<45} {total / 1000:>14.1f}")
+    print(f"\napp.main: median {median_ms:.0f} ms over {args.repeat} runs (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import time exceeds the budget by {median_ms - args.budget_ms:.0f} ms")
+        failed = True
+    loaded = sorted({name for _, names in runs for name in names})
+    if loaded:
+        print(f"FAIL: imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Load-test suite for the bookstore API hot paths
+
+Seeds a database at a configurable scale, starts the API and a local
+Paystack stub with uvicorn, drives each scenario at a fixed concurrency and
+reports throughput and p50/p95/p99 latency. Results can be saved as a
+baseline and later runs compared against it.
+
+Usage:
+    python benchmarks/loadtest.py --books 10000 --duration 10
+    python benchmarks/loadtest.py --save-baseline benchmarks/baseline.json
+    python benchmarks/loadtest.py --compare benchmarks/baseline.json --threshold 10
+
+Use --database-url for PostgreSQL (the database must exist), or --target-url
+to drive an already running deployment (seeding and servers are skipped).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["books_list", "books_search", "book_detail", "login", "create_order", "payment_verify"]
+PASSWORD = "loadtest-password"
+
+# Seeding
+
+def seed(database_url: str, books: int, users: int) -> None:
+    """Seed sample data with the app's own models, then scale the catalogue up"""
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Base, Book, User, UserRole
+    from app.auth.utils import get_password_hash
+    from app.books.search import ensure_search_index
+    from seed_database import seed_database
+
+    seed_database()
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        existing = db.query(Book).filter(Book.isbn.like("load-%")).count()
+        db.bulk_insert_mappings(Book, [
+            {
+                "title": f"Load Test Book {i}",
+                "author": f"Author {i % 1000}",
+                "description": random.choice(["python", "history", "fantasy", "science", "poetry"]) + " book",
+                "price": 5 + i % 40,
+                "stock_quantity": 1_000_000,
+                "isbn": f"load-{i}",
+            }
+            for i in range(existing, books)
+        ])
+        hashed = get_password_hash(PASSWORD)
+        for i in range(users):
+            email = f"load{i}@example.com"
+            if not db.query(User).filter(User.email == email).first():
+                db.add(User(email=email, username=f"load{i}", hashed_password=hashed,
+                            role=UserRole.USER, is_active=True))
+        db.commit()
+    finally:
+        db.close()
+    ensure_search_index(engine)
+
+# Servers
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(module: str, port: int, env: Dict[str, str], workers: int = 1) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env},
+    )
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+# Load generation
+
+class Context:
+    """State shared by scenario requests: tokens, ids and payment references"""
+
+    def __init__(self, client: httpx.AsyncClient, books: int, users: int):
+        self.client = client
+        self.book_ids: List[int] = []
+        self.tokens: List[str] = []
+        self.references: List[str] = []
+        self.books = books
+        self.users = users
+
+    async def prepare(self) -> None:
+        response = await self.client.get("/books/", params={"limit": 1000})
+        response.raise_for_status()
+        self.book_ids = [book["id"] for book in response.json()]
+        for i in range(min(self.users, 20)):
+            response = await self.client.post(
+                "/auth/login", data={"username": f"load{i}@example.com", "password": PASSWORD}
+            )
+            response.raise_for_status()
+            self.tokens.append(response.json()["access_token"])
+        # Payments to verify: one order + initiated transaction each
+        for _ in range(50):
+            order = await self.create_order()
+            response = await self.client.post(
+                "/orders/payment/initiate",
+                json={"order_id": order["id"], "amount": order["total_amount"],
+                      "email": "load0@example.com"},
+                headers=self.auth(),
+            )
+            if response.status_code == 200:
+                self.references.append(response.json()["reference"])
+
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {random.choice(self.tokens)}"}
+
+    async def create_order(self) -> dict:
+        items = [{"book_id": book_id, "quantity": 1} for book_id in random.sample(self.book_ids, 3)]
+        response = await self.client.post("/orders/", json={"order_items": items}, headers=self.auth())
+        response.raise_for_status()
+        return response.json()
+
+async def run_request(ctx: Context, scenario: str) -> httpx.Response:
+    client = ctx.client
+    if scenario == "books_list":
+        return await client.get("/books/", params={"limit": 100})
+    if scenario == "books_search":
+        return await client.get("/books/", params={"search": random.choice(["pyth", "hist", "fant", "author 12"])})
+    if scenario == "book_detail":
+        return await client.get(f"/books/{random.choice(ctx.book_ids)}")
+    if scenario == "login":
+        i = random.randrange(min(ctx.users, 20))
+        return await client.post("/auth/login", data={"username": f"load{i}@example.com", "password": PASSWORD})
+    if scenario == "create_order":
+        items = [{"book_id": book_id, "quantity": 1} for book_id in random.sample(ctx.book_ids, 3)]
+        return await client.post("/orders/", json={"order_items": items}, headers=ctx.auth())
+    if scenario == "payment_verify":
+        return await client.post("/orders/payment/verify", params={"reference": random.choice(ctx.references)})
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+async def drive(ctx: Context, scenario: str, concurrency: int, duration: float) -> dict:
+    """Run one scenario closed-loop at the given concurrency for duration seconds"""
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await run_request(ctx, scenario)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    return summarize(latencies, errors, elapsed)
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered), 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "p99_ms": round(percentile(ordered, 99), 2),
+    }
+
+# Reporting
+
+def print_report(results: Dict[str, dict], baseline: Dict[str, dict] = None) -> None:
+    header = f"{'scenario':<16}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    print(header + ("   vs baseline (rps / p95)" if baseline else ""))
+    print("-" * len(header))
+    for name, result in results.items():
+        line = (f"{name:<16}{result['throughput_rps']:>10}{result['p50_ms']:>10}"
+                f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}")
+        if baseline and name in baseline:
+            line += f"   {change(baseline[name]['throughput_rps'], result['throughput_rps']):>+7.1f}%"
+            line += f" / {change(baseline[name]['p95_ms'], result['p95_ms']):>+7.1f}%"
+        print(line)
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+def regressions(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Scenarios whose throughput dropped or p95 grew by more than threshold percent"""
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        if change(baseline[name]["throughput_rps"], result["throughput_rps"]) < -threshold:
+            found.append(f"{name}: throughput {baseline[name]['throughput_rps']} -> {result['throughput_rps']} rps")
+        if change(baseline[name]["p95_ms"], result["p95_ms"]) > threshold:
+            found.append(f"{name}: p95 {baseline[name]['p95_ms']} -> {result['p95_ms']} ms")
+    return found
+
+async def run_suite(args) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.target_url, limits=limits, timeout=30.0) as client:
+        ctx = Context(client, args.books, args.users)
+        await ctx.prepare()
+        results = {}
+        for scenario in args.scenarios:
+            print(f"Running {scenario} for {args.duration}s at concurrency {args.concurrency}...")
+            results[scenario] = await drive(ctx, scenario, args.concurrency, args.duration)
+        return results
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the bookstore API hot paths")
+    parser.add_argument("--database-url", help="Defaults to a fresh SQLite file")
+    parser.add_argument("--target-url", help="Drive an already running server instead of starting one")
+    parser.add_argument("--books", type=int, default=5000, help="Catalogue size to seed")
+    parser.add_argument("--users", type=int, default=20, help="Users to seed")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0, help="Simulated Paystack latency")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed for request mixes")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    servers = []
+    try:
+        if not args.target_url:
+            database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+            env = {
+                "DATABASE_URL": database_url,
+                "SECRET_KEY": os.getenv("SECRET_KEY", "loadtest-secret-key"),
+                "ENVIRONMENT": "production",
+                # Every simulated user shares 127.0.0.1
+                "RATE_LIMIT_ENABLED": "false",
+            }
+            os.environ.update(env)
+            print(f"Seeding {args.books} books and {args.users} users into {database_url}...")
+            seed(database_url, args.books, args.users)
+
+            stub_port, api_port = free_port(), free_port()
+            servers.append(start_server("app.orders.paystack_stub:app", stub_port,
+                                        {"PAYSTACK_STUB_LATENCY_MS": str(args.stub_latency_ms)}))
+            servers.append(start_server("app.main:app", api_port, {
+                **env,
+                "PAYSTACK_BASE_URL": f"http://127.0.0.1:{stub_port}",
+                "PAYSTACK_SECRET_KEY": "sk_test_loadtest",
+            }, workers=args.workers))
+            args.target_url = f"http://127.0.0.1:{api_port}"
+            wait_until_up(f"http://127.0.0.1:{stub_port}/docs")
+            wait_until_up(f"{args.target_url}/health")
+
+        results = asyncio.run(run_suite(args))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait(timeout=10)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print()
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "config": {key: getattr(args, key) for key in
+                           ("books", "users", "workers", "concurrency", "duration", "stub_latency_ms")},
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if baseline:
+        found = regressions(results, baseline, args.threshold)
+        if found:
+            print(f"\nRegressions beyond {args.threshold}%:")
+            for line in found:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Per-route SQL query budgets
+
+Seeds a throwaway SQLite database with enough orders and books that an
+N+1 pattern would show, calls each hot read route in-process with cold
+caches, counts the SQL statements it sends and exits non-zero when a route
+exceeds its budget. Budgets do not grow with the data: a route that issues
+one query per order, item or book fails here long before it shows up in
+latency. Run it in CI next to the import-time budget.
+
+Usage:
+    python benchmarks/query_budget.py
+    python benchmarks/query_budget.py --orders 50 --verbose
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Route -> maximum statements, with cold book and user caches. {order_id},
+# {book_id} and {isbn} are filled from the seeded data.
+BUDGETS: Dict[str, int] = {
+    # User, orders, then one selectin load each for items and their books
+    "/orders/": 4,
+    "/orders/?cursor=": 4,
+    "/orders/{order_id}": 4,
+    # Catalogue version, then the rows
+    "/books/": 2,
+    "/books/?cursor=": 2,
+    "/books/{book_id}": 1,
+    "/books/isbn/{isbn}": 1,
+    # Cache misses are fetched in one batch
+    "/books/popular": 1,
+    "/books/{book_id}/related": 2,
+}
+
+class QueryCounter:
+    """Collects the SQL statements executed while it is active"""
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries(bind):
+    """Count SQL statements sent through bind inside the block"""
+    from sqlalchemy import event
+    counter = QueryCounter()
+    event.listen(bind, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", counter._record)
+
+def seed(orders: int, items_per_order: int, books: int) -> dict:
+    """Create the schema and sample data; returns the values for the route placeholders"""
+    from app.database import Base, SessionLocal, get_engine
+    from app.models import Book, Order, OrderItem, OrderStatus, PaymentStatus, User, UserRole
+    from app.books.search import ensure_search_index
+
+    Base.metadata.create_all(bind=get_engine())
+    db = SessionLocal()
+    try:
+        user = User(email="budget@example.com", username="budget", hashed_password="-", role=UserRole.USER)
+        db.add(user)
+        db.add_all([
+            Book(title=f"Budget Book {i}", author=f"Author {i}", price=10 + i % 5,
+                 stock_quantity=100, isbn=f"budget-{i}")
+            for i in range(books)
+        ])
+        db.flush()
+        for i in range(orders):
+            order = Order(user_id=user.id, total_amount=0, status=OrderStatus.COMPLETED,
+                          payment_status=PaymentStatus.SUCCESS)
+            db.add(order)
+            db.flush()
+            db.add_all([
+                OrderItem(order_id=order.id, book_id=(i + j) % books + 1, quantity=1, price=10)
+                for j in range(items_per_order)
+            ])
+        db.commit()
+        placeholders = {"order_id": order.id, "book_id": 1, "isbn": "budget-0"}
+    finally:
+        db.close()
+    ensure_search_index(get_engine())
+    return placeholders
+
+def clear_caches() -> None:
+    from app.books.cache import book_cache
+    from app.auth.utils import user_cache
+    book_cache.local.clear()
+    user_cache.clear()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check per-route SQL query counts against budgets")
+    parser.add_argument("--orders", type=int, default=20, help="Orders seeded for the test user")
+    parser.add_argument("--items-per-order", type=int, default=3)
+    parser.add_argument("--books", type=int, default=50)
+    parser.add_argument("--verbose", action="store_true", help="Print the statements of failing routes")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="query-budget-")
+    # Settings are read at import, so configure the app before loading it
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'budget.db')}",
+        "DATABASE_REPLICA_URLS": "",
+        "CACHE_REDIS_URL": "",
+        "ENVIRONMENT": "development",
+        "SECRET_KEY": os.getenv("SECRET_KEY") or "query-budget-" + "x" * 32,
+        "RATE_LIMIT_ENABLED": "false",
+        "JWT_EMBED_USER_CLAIMS": "false",
+    })
+    sys.path.insert(0, ROOT)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.database import get_engine
+    from app.auth.utils import create_access_token
+    from app.books.recommendations import refresh_recommendations
+
+    placeholders = seed(args.orders, args.items_per_order, args.books)
+    refresh_recommendations()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'budget@example.com'})}"}
+
+    failed = False
+    with TestClient(app) as client:
+        print(f"{'route':<30} {'queries':>8} {'budget':>7}")
+        for route, budget in BUDGETS.items():
+            path = route.format(**placeholders)
+            # Once to open pooled connections, then measured with cold caches
+            client.get(path, headers=headers)
+            clear_caches()
+            with count_queries(get_engine()) as counter:
+                response = client.get(path, headers=headers)
+            status = "" if response.status_code == 200 else f"  (HTTP {response.status_code})"
+            over = counter.count > budget or response.status_code != 200
+            print(f"{route:<30} {counter.count:>8} {budget:>7}{'  OVER' if over else ''}{status}")
+            if over:
+                failed = True
+                if args.verbose:
+                    for statement in counter.statements:
+                        print(f"    {' '.join(statement.split())[:160]}")
+
+    print("FAIL" if failed else "OK")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Bulk book import script for bookstore
+Upserts books by ISBN from a CSV or NDJSON supplier feed
+
+Usage: python import_books.py feed.csv [--format ndjson] [--chunk-size 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import books from a CSV or NDJSON feed")
+    parser.add_argument("path", help="Feed file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per batched upsert")
+    args = parser.parse_args()
+    
+    if not os.getenv("DATABASE_URL"):
+        print("❌ DATABASE_URL environment variable not set!")
+        return False
+    
+    from app.database import SessionLocal
+    from app.books.bulk import import_books, iter_import_rows
+    
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    stream = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        report = import_books(db, iter_import_rows(stream, fmt), chunk_size=args.chunk_size)
+    finally:
+        db.close()
+        stream.close()
+    elapsed = time.perf_counter() - started
+    
+    print(f"📚 Processed {report['processed']} rows in {elapsed:.1f}s")
+    print(f"✅ Imported {report['imported']} books")
+    if report["failed"]:
+        print(f"⚠️  {report['failed']} rows failed:")
+        for error in report["errors"]:
+            print(f"   row {error['row']}: {error['error']}")
+    return report["failed"] == 0
+
+if __name__ == "__main__":
+    print("📥 Starting book import...")
+    if not main():
+        exit(1)
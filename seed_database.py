@@ -9,6 +9,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.models import Book, User, UserRole, Base
 from app.auth.utils import get_password_hash
+from app.books.search import ensure_search_index
 
 def seed_database():
     """Seed the database with sample data"""
@@ -134,6 +135,10 @@ def seed_database():
         # Commit all changes
         db.commit()
         
+        # Index the seeded books for search
+        ensure_search_index(engine)
+        print("✅ Search index built")
+        
         print(f"\n🎉 Database seeded successfully!")
         print(f"📚 Added {books_added} new books")
         print(f"👤 Admin user: admin@bookstore.com (password: admin123)")